@@ -2,11 +2,21 @@
 # Description: A simplified demonstration script for using the blynk_mqtt_sdk.py library
 # This script shows the basic connection to Blynk using MQTT, sending data,
 # and receiving commands. It relies on the SDK's auto-reconnection feature.
-# NB: This version has WiFi connection logic and custom logger removed.
+# NB: This version has no WiFi connection logic. Log output from the script and the SDK
+# (passed as log_func) is queued by _buffered_log() in a fixed-size ring buffer and written
+# to stdout with sys.stdout.write() once per main_loop iteration by _flush_log().
 # Ensure your device has an active internet connection before running.
 
+import sys
 import time
+import micropython # For @micropython.native on the hot handlers/loop
+from micropython import const
 import machine # For machine.unique_id(), machine.reset(), machine.version_tuple() (optional)
+import uselect # For waiting on the MQTT socket instead of a fixed sleep in main_loop
+import urandom # For jittering the error backoff in main_loop
+import ujson
+import array
+import gc # For collecting garbage at a fixed point in main_loop
 # Ensure blynk_mqtt_sdk.py is in the same directory or accessible in sys.path
 try:
     from lib.blynk_mqtt_sdk import BlynkMQTT # Assuming SDK version 0.3.0+ with auto-reconnect
@@ -18,6 +28,83 @@ except ImportError:
 # IMPORTANT: Replace these placeholders with your actual credentials and settings!
 BLYNK_AUTH_TOKEN = "YOUR_ACTUAL_BLYNK_AUTH_TOKEN"  # Get this from your Blynk project
 
+# Set to 0 to skip the per-iteration diagnostic prints in main_loop.
+_DEBUG = const(1)
+
+# Format strings for the periodic diagnostic prints, defined once so the loop
+# only does a single %-format instead of building an f-string each time.
+_FMT_V5 = "Sending V5 (counter): %d"
+_FMT_UPTIME = "Device Uptime: %ds"
+
+# --- Buffered Logging ---
+# print() on MicroPython is a blocking UART write, so log lines from main_loop and
+# the event handlers are queued in a fixed-size ring buffer and written out by
+# _flush_log() once per loop iteration, after the MQTT work for that iteration.
+# If the buffer overflows before a flush, the oldest bytes are dropped.
+_LOG_BUF_SIZE = const(1024)
+_log_buf = bytearray(_LOG_BUF_SIZE)
+_log_head = 0 # Next write position in _log_buf
+_log_len = 0  # Number of buffered bytes not yet flushed
+
+def _buffered_log(*args):
+    """Queue a log line (print-style arguments) in the ring buffer."""
+    global _log_head, _log_len
+    line = (" ".join([str(a) for a in args]) + "\n").encode()
+    n = len(line)
+    if n > _LOG_BUF_SIZE: # Keep only the tail of an oversized line
+        line = line[-_LOG_BUF_SIZE:]
+        n = _LOG_BUF_SIZE
+    first = min(n, _LOG_BUF_SIZE - _log_head)
+    _log_buf[_log_head:_log_head + first] = line[:first]
+    if first < n: # Wrap around to the start of the buffer
+        _log_buf[0:n - first] = line[first:]
+    _log_head = (_log_head + n) % _LOG_BUF_SIZE
+    _log_len = min(_log_len + n, _LOG_BUF_SIZE)
+
+def _flush_log():
+    """Write all buffered log bytes to stdout and empty the buffer."""
+    global _log_len
+    if not _log_len:
+        return
+    tail = (_log_head - _log_len) % _LOG_BUF_SIZE
+    mv = memoryview(_log_buf)
+    if tail + _log_len <= _LOG_BUF_SIZE:
+        sys.stdout.write(mv[tail:tail + _log_len])
+    else:
+        sys.stdout.write(mv[tail:])
+        sys.stdout.write(mv[:_log_head])
+    _log_len = 0
+
+# Loop counters kept as unsigned C ints: [0] = V5 counter, [1] = uptime in seconds.
+# Updating them in place avoids allocating a new int object once values leave the
+# small-int range (uptime does after a while).
+_state = array.array('I', [0, 0])
+
+# --- Garbage Collection ---
+# Collect early, at a predictable heap size, instead of letting a full heap trigger
+# a long collection at an arbitrary point (e.g. in the middle of a publish).
+# main_loop also calls gc.collect() itself while idle (see the end of the loop).
+gc.threshold(gc.mem_free() // 4 + gc.mem_alloc())
+
+# --- Board ID ---
+# The unique ID never changes, so it is read and hex-encoded once at import
+# instead of on every (re)connect.
+_HAS_UID = callable(getattr(machine, 'unique_id', None)) # Capability probed once
+_BOARD_ID = 'N/A'
+try:
+    if _HAS_UID:
+        _BOARD_ID = machine.unique_id().hex()
+except Exception as e:
+    print(f"Could not retrieve board_id: {e}")
+
+# Metadata published on every (re)connect. None of it changes at runtime, so it
+# is built and JSON-encoded once here and sent with publish_metadata_raw().
+_METADATA = {
+    "demo_script_version": "1.3.0-sdk-reconnect",
+    "board_id": _BOARD_ID
+}
+_METADATA_JSON = ujson.dumps(_METADATA).encode()
+
 # --- Network Connection (Board-Specific) ---
 # IMPORTANT: The WiFi connection logic has been removed from this demo script.
 # You MUST ensure that your MicroPython device has an active and configured
@@ -31,7 +118,7 @@ print("Initializing BlynkMQTT client...")
 # You can override reconnect_delay_s if needed, e.g., reconnect_delay_s=5
 blynk = BlynkMQTT(
     auth_token=BLYNK_AUTH_TOKEN,
-    log_func=print,  # Use standard print for SDK messages
+    log_func=_buffered_log,  # Queue SDK messages in the log ring buffer (see _flush_log)
     board_type="MicroPython Generic",
     fw_version="0.3.4-demo-sdk-reconnect", # Updated version for this change
     app_name="BlynkDemoApp/Simple",
@@ -44,55 +131,56 @@ blynk = BlynkMQTT(
 @blynk.on("connect")
 def handle_blynk_connect():
     """This function is called when the SDK successfully connects to the Blynk MQTT server."""
-    print("Blynk: Successfully connected (or reconnected) to MQTT server!")
+    _buffered_log("Blynk: Successfully connected (or reconnected) to MQTT server!")
     
-    blynk.virtual_write(0, f"MPy Demo Connected at {time.ticks_ms()}")
+    blynk.virtual_write(0, f"MPy Demo Connected at {time.ticks_ms()}", qos=0)
     blynk.set_property("v0", "label", "Device Status")
     blynk.log_event("device_script_started", "Simplified demo connected.")
     
-    board_id_str = 'N/A'
-    try:
-        if hasattr(machine, 'unique_id') and callable(machine.unique_id):
-            uid_bytes = machine.unique_id()
-            board_id_str = "".join(["{:02x}".format(b) for b in uid_bytes])
-    except Exception as e:
-        print(f"Could not retrieve board_id: {e}")
-
-    blynk.publish_metadata({
-        "demo_script_version": "1.3.0-sdk-reconnect",
-        "board_id": board_id_str
-    })
-    print("Blynk: On-connect tasks complete.")
+    blynk.publish_metadata_raw(_METADATA_JSON)
+    _buffered_log("Blynk: On-connect tasks complete.")
 
 @blynk.on("disconnect")
 def handle_blynk_disconnect():
     """This function is called when the SDK disconnects from the Blynk MQTT server."""
-    print("Blynk: Disconnected from MQTT server. SDK will attempt to reconnect if auto_reconnect is enabled.")
+    _buffered_log("Blynk: Disconnected from MQTT server. SDK will attempt to reconnect if auto_reconnect is enabled.")
 
+# Virtual pin handlers registered with @blynk.on("V<pin>") are stored in the SDK's
+# blynk.handlers_by_pin table, so incoming writes are dispatched by pin number.
 @blynk.on("V1")
+@micropython.native
 def handle_v1_write(value):
     """Handles incoming data on Virtual Pin V1 from the Blynk app/server."""
-    print(f"Blynk: V1 received raw value: '{value}' (type: {type(value)})")
+    if not blynk.connected:
+        return # The echoes below can't be sent; skip building their payloads
+    _buffered_log(f"Blynk: V1 received raw value: '{value}' (type: {type(value)})")
     
     processed_value = value
     if isinstance(value, list) and len(value) > 0:
         processed_value = value[0]
 
-    blynk.virtual_write(2, f"V1 Echo: {processed_value}")
+    blynk.virtual_write(2, f"V1 Echo: {processed_value}", qos=0)
     
-    if str(processed_value) == '1':
-        print("V1: Command ON received.")
-        blynk.virtual_write(3, "V1 is ON")
+    # Convert once and compare ints; buttons send "1"/"0" (or 1/0).
+    try:
+        v = int(processed_value)
+    except (TypeError, ValueError):
+        v = -1 # Not a switch command
+
+    if v == 1:
+        _buffered_log("V1: Command ON received.")
+        blynk.virtual_write(3, "V1 is ON", qos=0)
         # Add your code here to turn something ON
-    elif str(processed_value) == '0':
-        print("V1: Command OFF received.")
-        blynk.virtual_write(3, "V1 is OFF")
+    elif v == 0:
+        _buffered_log("V1: Command OFF received.")
+        blynk.virtual_write(3, "V1 is OFF", qos=0)
         # Add your code here to turn something OFF
 
 @blynk.on("property_get")
+@micropython.native
 def handle_property_get(pin_designator, property_name):
     """Handles requests from the Blynk server to get the current value of a widget property."""
-    print(f"Blynk: Server requested property '{property_name}' for pin '{pin_designator}'")
+    _buffered_log(f"Blynk: Server requested property '{property_name}' for pin '{pin_designator}'")
     if pin_designator == "v0" and property_name == "label":
         uptime_s = time.ticks_ms() // 1000
         blynk.set_property("v0", "label", f"Online ({uptime_s}s)")
@@ -100,33 +188,79 @@ def handle_property_get(pin_designator, property_name):
         blynk.set_property("v5", "color", "#00FF00")
 
 @blynk.on("automation_response")
+@micropython.native
 def handle_automation_response(automation_id, status, message):
     """Handles the server's response after an automation has been triggered by this device."""
-    print(f"Blynk: Automation ID {automation_id} response: Status='{status}', Message='{message or ''}'")
+    _buffered_log(f"Blynk: Automation ID {automation_id} response: Status='{status}', Message='{message or ''}'")
     if status == "success":
-        blynk.virtual_write(8, f"Auto {automation_id} OK")
+        blynk.virtual_write(8, f"Auto {automation_id} OK", qos=0)
     else:
-        blynk.virtual_write(8, f"Auto {automation_id} Fail: {message or 'Unknown'}")
+        blynk.virtual_write(8, f"Auto {automation_id} Fail: {message or 'Unknown'}", qos=0)
 
 # --- Main Application Loop ---
+# Loop timing constants. const() lets the MicroPython compiler inline them.
+_DATA_PERIOD_MS = const(15000)    # V5 counter send period
+_UPTIME_PERIOD_MS = const(60000)  # V99 uptime and device log period
+_NOTIFY_PERIOD_MS = const(150000) # Notification period (every 10th V5 send)
+_SLEEP_MS = const(100)            # Loop pace while disconnected
+_BACKOFF_MAX_S = const(60)        # Upper bound for the error backoff in main_loop
+
+def _backoff_after_error(e, backoff_s):
+    """Log an unexpected main_loop error, sleep for the current backoff and return the next one."""
+    _buffered_log(f"An unexpected error occurred in the main loop: {e}")
+    _flush_log()
+    # Potentially add more robust error handling here.
+    # Back off exponentially with up to 1 s of random jitter, so persistent
+    # errors don't spin the loop and many devices don't retry in lockstep.
+    time.sleep(backoff_s + urandom.getrandbits(8) / 256.0)
+    return min(backoff_s * 2, _BACKOFF_MAX_S)
+
+# The handlers above and main_loop are compiled with @micropython.native, which
+# emits machine code instead of bytecode for these frequently executed functions.
+@micropython.native
 def main_loop():
     """Main operational loop for the Blynk demo application."""
-    print("Starting main application loop...")
+    _buffered_log("Starting main application loop...")
     
     # Attempt initial connection.
     # Even with auto-reconnect in the SDK, an initial explicit connect is good practice.
     # The SDK's auto-reconnect will take over if this initial connection fails
     # or if the connection drops later.
     if not blynk.connect():
-        print("Initial connection to Blynk failed. SDK will attempt to auto-reconnect if enabled.")
+        _buffered_log("Initial connection to Blynk failed. SDK will attempt to auto-reconnect if enabled.")
         # The loop will continue, and blynk.run() will handle reconnection attempts.
 
-    counter = 0
-    last_data_send_time_s = time.ticks_seconds()
-    last_uptime_send_time_s = time.ticks_seconds()
+    state = _state
+    state[0] = 0 # counter
+    last_data_send_ms = time.ticks_ms()
+    last_uptime_send_ms = last_data_send_ms
+    # Notifications go out every _NOTIFY_PERIOD_MS, checked when V5 fires.
+    next_notify_ms = time.ticks_add(last_data_send_ms, _NOTIFY_PERIOD_MS)
+    # Virtual pin values staged during this iteration ({pin_number: value}).
+    # They are flushed together at the end of the iteration with a single
+    # blynk.virtual_write_batch() call, i.e. one MQTT PUBLISH instead of one per pin.
+    pending_writes = {}
+    # Poller used to sleep until the MQTT socket has data (see end of the loop).
+    poller = uselect.poll()
+    polled_sock = None
+    # Delay after an unexpected error; doubles on consecutive errors (up to
+    # _BACKOFF_MAX_S) and resets after an iteration completes without error.
+    backoff_s = 1
+
+    # Bind frequently used functions to locals once: local loads are much cheaper
+    # than global/attribute lookups on every iteration of the loop.
+    b = blynk
+    run = b.run
+    vwrite_batch = b.virtual_write_batch
+    ticks_ms = time.ticks_ms
+    ticks_diff = time.ticks_diff
+    poll = poller.poll
 
-    while True:
-        try:
+    # Only blynk.run() and the publish block below can realistically raise, so the
+    # exception handlers wrap just those; the bookkeeping and the wait run without
+    # an exception frame. KeyboardInterrupt is handled once, around the whole loop.
+    try:
+        while True:
             # --- Call blynk.run() periodically ---
             # This is CRITICAL for Blynk communication.
             # With SDK v0.3.0+, blynk.run() is responsible for:
@@ -135,7 +269,11 @@ def main_loop():
             #   3. Handling automatic reconnection if the connection is lost
             #      (provided auto_reconnect is enabled, which is the default).
             #   4. Basic error handling for message processing.
-            blynk.run()
+            try:
+                run()
+            except Exception as e:
+                backoff_s = _backoff_after_error(e, backoff_s)
+                continue
 
 
             # --- Your Application Logic ---
@@ -145,50 +283,102 @@ def main_loop():
             # It's good practice to check blynk.connected before performing Blynk operations
             # if you want to avoid attempts when disconnected, or to handle that case specifically.
             
-            current_time_s = time.ticks_seconds()
+            # Read the clock once per iteration; all deadlines are tracked in ms.
+            now_ms = ticks_ms()
+            published = False # Set when this iteration sends data
 
             # Send simulated data periodically (only if connected)
-            if blynk.connected: # Check if connected before trying to send data
-                if time.ticks_diff(current_time_s, last_data_send_time_s) >= 15:
-                    counter += 1
-                    print(f"Sending V5 (counter): {counter}")
-                    # virtual_write will return False if not connected or publish fails
-                    if not blynk.virtual_write(5, counter):
-                         print("Failed to send V5 data (likely disconnected).")
-                    
-                    if counter % 10 == 0:
-                        blynk.notify(f"Device counter reached {counter}!")
-                    
-                    last_data_send_time_s = current_time_s
-
-                # Send device uptime periodically (only if connected)
-                if time.ticks_diff(current_time_s, last_uptime_send_time_s) >= 60:
-                    uptime_s_total = time.ticks_ms() // 1000
-                    if not blynk.virtual_write(99, uptime_s_total): # Send uptime in seconds to V99
-                        print("Failed to send uptime data (likely disconnected).")
-                    else:
-                        print(f"Device Uptime: {uptime_s_total}s")
-
-                    blynk.device_log("info", f"Device uptime: {uptime_s_total}s. Counter: {counter}.")
-                    last_uptime_send_time_s = current_time_s
+            if b.connected: # Check if connected before trying to send data
+                send_data = ticks_diff(now_ms, last_data_send_ms) >= _DATA_PERIOD_MS
+                send_uptime = ticks_diff(now_ms, last_uptime_send_ms) >= _UPTIME_PERIOD_MS
+                if send_data or send_uptime:
+                    published = True
+                    try:
+                        # Batch this iteration's publishes (notify, device log, V5/V99) so
+                        # they leave the device in a single socket write.
+                        b._begin_batch()
+
+                        if send_data:
+                            state[0] += 1 # counter
+                            if _DEBUG:
+                                _buffered_log(_FMT_V5 % state[0])
+                            pending_writes[5] = state[0]
+
+                            if ticks_diff(now_ms, next_notify_ms) >= 0:
+                                b.notify(f"Device counter reached {state[0]}!")
+                                next_notify_ms = time.ticks_add(now_ms, _NOTIFY_PERIOD_MS)
+
+                            last_data_send_ms = now_ms
+
+                        # Send device uptime periodically (only if connected)
+                        if send_uptime:
+                            state[1] = now_ms // 1000 # uptime in seconds
+                            pending_writes[99] = state[1] # Send uptime in seconds to V99
+                            if _DEBUG:
+                                _buffered_log(_FMT_UPTIME % state[1])
+
+                            b.device_log("info", f"Device uptime: {state[1]}s. Counter: {state[0]}.")
+                            last_uptime_send_ms = now_ms
+
+                        # Stage all virtual pin values as one publish
+                        if pending_writes:
+                            # virtual_write_batch will return False if not connected or publish fails
+                            if not vwrite_batch(pending_writes, qos=0):
+                                _buffered_log(f"Failed to send {pending_writes} (likely disconnected).")
+                            pending_writes.clear()
+
+                        if not b._flush_batch():
+                            _buffered_log("Failed to send batched publishes (likely disconnected).")
+                    except Exception as e:
+                        pending_writes.clear()
+                        backoff_s = _backoff_after_error(e, backoff_s)
+                        continue
             else:
                 # Optional: Add logic here if you want to do something specific when disconnected,
                 # e.g., print a status, blink an LED, or pause certain tasks.
                 # For this demo, we'll just let blynk.run() handle reconnection attempts.
-                # print("Currently disconnected from Blynk. SDK is attempting to reconnect...")
+                # _buffered_log("Currently disconnected from Blynk. SDK is attempting to reconnect...")
                 pass # blynk.run() handles reconnection attempts
+
+            # All MQTT work for this iteration is done: write out queued log lines
+            # now, before waiting, so the UART writes stay off the publish path.
+            _flush_log()
             
-            # A small delay to control the loop speed and allow MicroPython to handle
-            # other background tasks if any.
-            time.sleep_ms(100) # Increased slightly as blynk.run() now does more
-
-        except KeyboardInterrupt:
-            print("Keyboard interrupt detected. Disconnecting and exiting...")
-            break # Exit the main while loop
-        except Exception as e:
-            print(f"An unexpected error occurred in the main loop: {e}")
-            # Potentially add more robust error handling here.
-            time.sleep(5) # Wait a bit before continuing to avoid rapid error loops
+            # Wait for incoming data on the MQTT socket instead of sleeping a fixed
+            # 100 ms: poll() returns as soon as a message arrives, or when the next
+            # periodic send is due. The socket changes on every (re)connect, so the
+            # poller registration is refreshed whenever blynk.sock changes.
+            sock = b.sock
+            if sock is not polled_sock:
+                if polled_sock is not None:
+                    try:
+                        poller.unregister(polled_sock)
+                    except (OSError, ValueError, KeyError):
+                        pass # Old socket already closed/unknown to the poller
+                if sock is not None:
+                    poller.register(sock, uselect.POLLIN)
+                polled_sock = sock
+
+            if sock is None:
+                # Not connected: nothing to wait on, keep the original loop pace.
+                time.sleep_ms(_SLEEP_MS)
+                events = None
+            else:
+                wait_ms = min(_DATA_PERIOD_MS - ticks_diff(now_ms, last_data_send_ms),
+                              _UPTIME_PERIOD_MS - ticks_diff(now_ms, last_uptime_send_ms))
+                events = poll(max(0, wait_ms))
+
+            # Collect garbage here, at a quiescent point, so GC pauses land between
+            # iterations rather than inside a publish. Skipped when this iteration
+            # published or an incoming message is waiting, so GC never delays them.
+            if not published and not events:
+                gc.collect()
+
+            backoff_s = 1 # Clean iteration, reset the error backoff
+
+    except KeyboardInterrupt:
+        _buffered_log("Keyboard interrupt detected. Disconnecting and exiting...")
+        _flush_log()
 
 # --- Script Execution ---
 if __name__ == "__main__":
@@ -197,6 +387,7 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Critical error in script execution: {e}")
     finally:
+        _flush_log() # Don't lose log lines still queued in the ring buffer
         # Cleanup: Disconnect from Blynk when the program finishes or is interrupted
         if 'blynk' in locals() and blynk and blynk.connected:
             print("Disconnecting from Blynk before exiting.")
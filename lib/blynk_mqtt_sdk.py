@@ -11,7 +11,31 @@
 #           Property Get, Automation, Device Log. Refined connect and callbacks.
 # - v0.1.0: Initial version.
 
-import ujson as json
+# JSON codec: MicroPython's C `ujson`, else (CPython, e.g. for testing) `orjson` or the
+# standard library. `_dumps` returns JSON as bytes, ready to publish; compact wherever the
+# codec supports it (all but MicroPython ports older than 1.20).
+try:
+    import ujson as json
+    # ujson.dumps returns a str and defaults to (', ', ': ') separators. MicroPython >= 1.20
+    # accepts `separators` for compact output; older ports raise TypeError for it.
+    try:
+        json.dumps(0, separators=(',', ':'))
+        def _dumps(obj):
+            return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+    except TypeError:
+        def _dumps(obj):
+            return json.dumps(obj).encode('utf-8')
+except ImportError:
+    try:
+        import orjson as json
+        _dumps = json.dumps # Returns compact bytes directly
+    except ImportError:
+        import json
+        # One shared encoder with compact separators, so the default (', ', ': ') isn't used
+        _json_encode = json.JSONEncoder(separators=(',', ':')).encode
+        def _dumps(obj):
+            return _json_encode(obj).encode('utf-8')
+
 try:
     from umqtt.simple import MQTTClient
 except ImportError:
@@ -31,6 +55,10 @@ except ImportError:
         def ping(self): pass
 
 import time
+try:
+    import heapq
+except ImportError: # Older MicroPython ports only provide the u-prefixed name
+    import uheapq as heapq
 import machine # For unique_id, if available, to generate a default MQTT client_id
 
 # Default MQTT server details for Blynk Cloud
@@ -63,6 +91,128 @@ TOPIC_PROPERTY_GET = TOPIC_PREFIX + "property/get"           # For server reques
 TOPIC_AUTOMATION_RESPONSE = TOPIC_PREFIX + "automation/response" # For receiving execution status of triggered automations
 TOPIC_OTA_REQUEST = TOPIC_PREFIX + "ota/request"             # For receiving OTA commands from Blynk (for custom OTA implementations)
 
+# --- Pre-encoded Topics ---
+# umqtt.simple takes topics as bytes. The topics are fixed ASCII strings, so they are
+# encoded once here instead of on every subscribe/publish.
+TOPIC_DATA_STREAM_B = TOPIC_DATA_STREAM.encode('utf-8')
+TOPIC_NOTIFICATIONS_B = TOPIC_NOTIFICATIONS.encode('utf-8')
+TOPIC_PROPERTY_UPDATE_B = TOPIC_PROPERTY_UPDATE.encode('utf-8')
+TOPIC_EVENT_B = TOPIC_EVENT.encode('utf-8')
+TOPIC_INFO_UPDATE_B = TOPIC_INFO_UPDATE.encode('utf-8')
+TOPIC_BRIDGE_REQUEST_B = TOPIC_BRIDGE_REQUEST.encode('utf-8')
+TOPIC_LOCATION_UPDATE_B = TOPIC_LOCATION_UPDATE.encode('utf-8')
+TOPIC_METADATA_UPDATE_B = TOPIC_METADATA_UPDATE.encode('utf-8')
+TOPIC_AUTOMATION_TRIGGER_B = TOPIC_AUTOMATION_TRIGGER.encode('utf-8')
+TOPIC_DEVICE_LOG_B = TOPIC_DEVICE_LOG.encode('utf-8')
+TOPIC_OTA_UPDATE_B = TOPIC_OTA_UPDATE.encode('utf-8')
+TOPIC_CONTROL_B = TOPIC_CONTROL.encode('utf-8')
+TOPIC_INFO_GET_B = TOPIC_INFO_GET.encode('utf-8')
+TOPIC_PROPERTY_GET_B = TOPIC_PROPERTY_GET.encode('utf-8')
+TOPIC_AUTOMATION_RESPONSE_B = TOPIC_AUTOMATION_RESPONSE.encode('utf-8')
+TOPIC_OTA_REQUEST_B = TOPIC_OTA_REQUEST.encode('utf-8')
+
+# Topics subscribed to on every connect. umqtt.simple's subscribe method takes bytes.
+_SUBSCRIBE_TOPICS = (
+    TOPIC_CONTROL_B,             # Essential for receiving widget commands, virtual pin writes from app/server
+    TOPIC_INFO_GET_B,            # For server requests for device information
+    TOPIC_PROPERTY_GET_B,        # For server requests for widget property values
+    TOPIC_AUTOMATION_RESPONSE_B, # For receiving status updates about triggered automations
+    TOPIC_OTA_REQUEST_B,         # For receiving OTA commands (if custom OTA is implemented)
+)
+
+# Event names used as `_handlers` keys (see `BlynkMQTT.on`). Referencing module constants
+# instead of repeating the literals lets MicroPython reuse the same interned qstr.
+_EV_CONNECT = 'connect'
+_EV_DISCONNECT = 'disconnect'
+_EV_INFO_GET = 'info_get'
+_EV_PROPERTY_GET = 'property_get'
+_EV_AUTOMATION_RESPONSE = 'automation_response'
+_EV_OTA_REQUEST = 'ota_request'
+_EV_VIRTUAL = 'virtual'
+_KNOWN_EVENTS = frozenset((_EV_CONNECT, _EV_DISCONNECT, _EV_INFO_GET, _EV_PROPERTY_GET,
+                           _EV_AUTOMATION_RESPONSE, _EV_OTA_REQUEST))
+
+# Scheduler limits (see `BlynkMQTT.schedule`). MicroPython small ints are 31-bit on 32-bit
+# ports; anything larger is a heap-allocated bigint. The scheduler clock is rebased to 0
+# once it reaches _SCHED_REBASE_MS (about 3 days) and periods are capped, so due times stay
+# below 2**29 + 2**28 and every heap comparison stays a small-int comparison.
+_SCHED_REBASE_MS = 1 << 28
+_SCHED_MAX_PERIOD_MS = 1 << 28
+
+# Levels accepted by `BlynkMQTT.device_log`
+_VALID_LOG_LEVELS = frozenset(("trace", "debug", "info", "warn", "error"))
+# Encoded start of the device_log payload for each level, so only the message is JSON-encoded
+_LOG_PREFIX = {level: b'{"level":"' + level.encode() + b'","message":' for level in _VALID_LOG_LEVELS}
+
+
+def _parse_vpin(name):
+    """
+    Parse a virtual pin designator such as "V5" or "v5" (as used by `BlynkMQTT.on` and in
+    control messages). The prefix is checked by its first character, without a lowercased copy.
+
+    :param name: String to parse.
+    :return: The pin number (not range-checked), or -1 if `name` is not a virtual pin designator.
+    """
+    if name and (name[0] == 'v' or name[0] == 'V'):
+        digits = name[1:]
+        if digits.isdigit():
+            return int(digits)
+    return -1
+
+
+def _str(value):
+    """Return `value` as a string, without a str() call for strings. None stays None (see `_pack`)."""
+    if value is None or type(value) is str:
+        return value
+    return str(value)
+
+
+def _int(value):
+    """Return `value` as an integer, without an int() call for integers. None stays None (see `_pack`)."""
+    if value is None or type(value) is int:
+        return value
+    return int(value)
+
+
+def _pack(payload, *items):
+    """
+    Add the optional fields of a payload dictionary: each `(key, value)` pair in `items` whose
+    value is not None. Replaces a chain of `if x is not None: payload[key] = x` statements.
+
+    :param payload: Dictionary with the mandatory fields.
+    :param items: `(key, value)` tuples.
+    :return: `payload`.
+    """
+    for key, value in items:
+        if value is not None:
+            payload[key] = value
+    return payload
+
+
+def _noop(*args):
+    """Default logger: discards all log messages."""
+    pass
+
+
+class _BatchWriter:
+    """
+    Stand-in for the MQTT socket while publishes are being batched (see `BlynkMQTT._begin_batch`).
+    `umqtt.simple` writes each PUBLISH as several small `sock.write()` calls; these are
+    collected here so that `_flush_batch` can send all of them with one write on the real socket.
+    """
+    __slots__ = ("sock", "buf")
+
+    def __init__(self, sock):
+        self.sock = sock       # The real socket, restored when the batch ends
+        self.buf = bytearray() # Collected MQTT packet bytes
+
+    def write(self, data, length=None):
+        if length is None:
+            self.buf.extend(data)
+        else:
+            self.buf.extend(memoryview(data)[:length])
+        return len(data) if length is None else length
+
 
 class BlynkMQTT:
     """
@@ -72,10 +222,23 @@ class BlynkMQTT:
     It handles connection, authentication, publishing data to virtual pins,
     receiving commands, and other Blynk-specific MQTT functionalities.
     """
+    # Fixed attribute set: on CPython, slot access is faster than an instance `__dict__` and
+    # uses less memory. MicroPython ignores `__slots__`, so this costs nothing there.
+    __slots__ = (
+        "auth_token", "server", "port", "client_id", "user", "password", "ssl", "ssl_params",
+        "log", "_log_enabled", "connected", "mqtt",
+        "_handlers", "handlers_by_pin", "_any_virtual_handler", "_has_pin_handlers", "_topic_dispatch",
+        "_last_activity_ms", "_last_tx_ms", "_ping_interval", "_batch",
+        "_tasks", "_task_seq", "_sched_ms", "_sched_ticks",
+        "buffered", "idle_flush_ms", "batch_max", "_pending_stream", "_pending_since_ms", "_tx_buf",
+        "_device_info", "_device_info_cache",
+    )
+
     def __init__(self, auth_token, server=MQTT_SERVER, port=None,
                  client_id=None, user=None, password="", ssl=False, ssl_params=None,
-                 log_func=None, keepalive=60,
-                 board_type=None, fw_version=None, app_name=None):
+                 log_func=None, keepalive=160,
+                 board_type=None, fw_version=None, app_name=None,
+                 buffered=False, idle_flush_ms=100, batch_max=8):
         """
         Initialize the BlynkMQTT client.
 
@@ -91,16 +254,28 @@ class BlynkMQTT:
         :param ssl_params: Dictionary of SSL parameters (e.g., for certificates if using a private server
                            or specific SSL configurations). Passed directly to `umqtt.simple.MQTTClient`.
         :param log_func: Optional custom logging function (e.g., `print` or a more sophisticated logger).
-                         It will be called with string arguments. Defaults to a no-op lambda.
+                         It will be called with string arguments. Defaults to a no-op function; when no logger is set,
+                         log messages are not formatted at all.
         :param keepalive: MQTT keepalive interval in seconds. Defines the maximum period between
-                          messages sent by the client. If no other messages are sent, a PINGREQ
-                          will be sent. `umqtt.simple` handles this.
+                          messages sent by the client. If no other messages are sent, `run()`
+                          sends a PINGREQ (see `ping_interval`). The default of 160 s keeps idle
+                          devices online behind typical cloud load balancers (which drop idle
+                          connections after 3-5 minutes) while sending far fewer pings than 60 s,
+                          which matters on metered/cellular links. Lower it if your network drops
+                          idle connections sooner.
         :param board_type: Optional. String identifying the board type (e.g., "ESP32", "RP2040").
                            Used for the `info/update` topic.
         :param fw_version: Optional. String identifying the firmware version (e.g., "1.0.0").
                            Used for the `info/update` topic.
         :param app_name: Optional. String identifying the application name/version (e.g., "MyProject/1.2.3").
                          Used for the `info/update` topic.
+        :param buffered: Boolean. If True, QoS 0 `virtual_write` calls are not published immediately
+                         but collected and sent together as one `data/stream` message (see `flush`).
+                         This saves per-message overhead on slow links (e.g. cellular).
+        :param idle_flush_ms: In buffered mode, the longest time (ms) a value waits before `run()`
+                              sends the collected values.
+        :param batch_max: In buffered mode, the number of distinct pins after which the collected
+                          values are sent right away.
         """
         if not auth_token:
             raise ValueError("Blynk authentication token ('auth_token') is required.")
@@ -115,12 +290,13 @@ class BlynkMQTT:
         if client_id is None:
             try:
                 # Attempt to create a unique client_id using the MCU's unique ID
-                client_id_hex = "".join(["{:02x}".format(b) for b in machine.unique_id()])
+                client_id_hex = machine.unique_id().hex() # Lowercase hex, one C call (as in examples/demo.py)
                 client_id = "blynk_mp_" + client_id_hex
             except (ImportError, AttributeError, NameError, TypeError): # machine or unique_id might not be available/work
-                # Fallback to a short random string for client_id if unique_id fails
+                # Fallback to a short random string for client_id if unique_id fails:
+                # 32 random bits (MicroPython's getrandbits maximum) as 8 hex digits.
                 import urandom
-                client_id = "blynk_mp_" + "".join([chr(ord('a') + urandom.getrandbits(5) % 26) for _ in range(8)])
+                client_id = "blynk_mp_%08x" % urandom.getrandbits(32)
         self.client_id = client_id
 
         # According to Blynk MQTT documentation, the username should be the auth_token.
@@ -131,11 +307,41 @@ class BlynkMQTT:
         self.ssl = ssl
         self.ssl_params = ssl_params if ssl_params is not None else {} # Ensure it's a dict for MQTTClient
         
-        self.log = log_func if callable(log_func) else (lambda *args: None) # Default to a no-operation logger
+        self.log = log_func if callable(log_func) else _noop # Default to a no-operation logger
+        # Checked before building f-string log messages, so no string formatting is done
+        # on the RX/TX paths when no logger is set.
+        self._log_enabled = self.log is not _noop
         
         self.connected = False  # Tracks the MQTT connection state
         self._handlers = {}     # Dictionary to store user-defined event handlers (e.g., for V0, 'connect')
+        # Virtual pin write handlers indexed by pin number (0-255), filled by `on("V<pin>")`.
+        # Incoming control messages index this list directly instead of building a key string.
+        self.handlers_by_pin = [None] * 256
+        self._any_virtual_handler = None # Catch-all virtual pin handler, set by `on('virtual')`
+        self._has_pin_handlers = False   # Set once a handler is known to be in `handlers_by_pin`
         self._last_activity_ms = time.ticks_ms() # Timestamp of the last MQTT send/receive activity
+        # Timestamp of the last packet sent. Only client-to-broker packets reset the broker's
+        # keepalive timer, so this (not `_last_activity_ms`) decides when a PINGREQ is due.
+        self._last_tx_ms = self._last_activity_ms
+        self._ping_interval = keepalive
+        self._batch = None      # _BatchWriter while publishes are being batched, else None
+        # Periodic tasks (see `schedule`): a heap of [due_ms, seq, period_ms, func], ordered by
+        # due time in `_sched_ms`, a scheduler clock in ms that, unlike ticks_ms(), doesn't wrap
+        # (it is periodically rebased instead, see `_sched_clock`).
+        self._tasks = []
+        self._task_seq = 0 # Insertion counter; breaks ties between tasks due at the same time
+        self._sched_ms = 0
+        self._sched_ticks = self._last_activity_ms # ticks_ms() value `_sched_ms` was last advanced at
+
+        # Buffered virtual_write (see `flush`): pending {"v<pin>": value} and when the first was added
+        self.buffered = buffered
+        self.idle_flush_ms = idle_flush_ms
+        self.batch_max = batch_max
+        self._pending_stream = {}
+        self._pending_since_ms = 0
+        # Reusable buffer for assembling the common single-value payloads (see `_publish_pin`),
+        # so virtual_write/notify don't allocate a dict and a JSON string per publish.
+        self._tx_buf = bytearray(256)
 
         # Store device information provided at initialization for automatic `info/update`
         self._device_info = {
@@ -143,6 +349,9 @@ class BlynkMQTT:
             "firmwareVersion": fw_version,
             "appName": app_name
         }
+        # (key, encoded_bytes): the info/update payload last built by publish_device_info and
+        # the (board, firmwareVersion, appName) values it was encoded from
+        self._device_info_cache = (None, None)
 
         # Initialize the underlying umqtt.simple.MQTTClient
         self.mqtt = MQTTClient(
@@ -155,108 +364,196 @@ class BlynkMQTT:
             ssl=self.ssl,
             ssl_params=self.ssl_params
         )
+        # Handlers for the subscribed topics, keyed by topic bytes as received in `_mqtt_message_callback`
+        self._topic_dispatch = {
+            TOPIC_CONTROL_B: self._handle_control,
+            TOPIC_INFO_GET_B: self._handle_info_get,
+            TOPIC_PROPERTY_GET_B: self._handle_property_get,
+            TOPIC_AUTOMATION_RESPONSE_B: self._handle_automation_response,
+            TOPIC_OTA_REQUEST_B: self._handle_ota_request,
+        }
         # Set the callback for incoming MQTT messages
         self.mqtt.set_callback(self._mqtt_message_callback)
         self.log("BlynkMQTT client initialized.")
 
+    def _log(self, fmt, *args):
+        """
+        Log a `%`-style message. All formatted log messages go through here: the message is
+        only formatted if a logger is set, so callers pass their values unformatted and need
+        no `if self._log_enabled:` check. Bytes arguments (topics, payloads) are decoded as
+        UTF-8 at that point, so the RX/TX paths don't decode anything without a logger.
+        Constant messages are passed to `self.log` directly.
+
+        :param fmt: Format string, e.g. "Error in run loop: %s".
+        :param args: Values for the format string's placeholders.
+        """
+        if self._log_enabled:
+            if args:
+                args = tuple(a.decode('utf-8') if isinstance(a, (bytes, bytearray)) else a for a in args)
+            self.log(fmt % args)
+
     def _mqtt_message_callback(self, topic_bytes, msg_bytes):
         """
         Internal callback method invoked by `umqtt.simple` when an MQTT message is received
         on a subscribed topic.
 
-        It decodes the topic and message, parses JSON payloads, and routes the message
-        to the appropriate handler based on the topic.
+        It routes the message to the `_handle_*` method registered for the topic in
+        `_topic_dispatch`. The dispatch table is keyed by the pre-encoded topic bytes, so the
+        topic is never decoded to a string. The handlers parse the JSON payload themselves,
+        and only when something (a registered handler or the logger) will use it.
 
         :param topic_bytes: Bytes, the topic on which the message was received.
         :param msg_bytes: Bytes, the payload of the received message.
         """
-        topic_str = topic_bytes.decode('utf-8') # Topics are UTF-8
-        msg_str = msg_bytes.decode('utf-8')   # Payloads are typically UTF-8 JSON strings
-        self.log(f"MQTT RX: Topic='{topic_str}', Msg='{msg_str}'")
+        self._log("MQTT RX: Topic='%s', Msg='%s'", topic_bytes, msg_bytes)
         self._last_activity_ms = time.ticks_ms() # Update activity timestamp
 
+        # Route message to the handler for its topic (one dict lookup, see `_topic_dispatch`)
+        handler = self._topic_dispatch.get(topic_bytes)
+        if handler is not None:
+            handler(msg_bytes)
+        else:
+            # Message on a subscribed topic that doesn't have specific handling logic here.
+            self._log("Warning: Received message on an unhandled subscribed topic: %s", topic_bytes)
+
+    def _loads(self, topic_bytes, msg_bytes):
+        """
+        Parse a JSON message payload.
+
+        :param topic_bytes: Bytes, the topic the message was received on (for the error log).
+        :param msg_bytes: Bytes, the payload of the received message.
+        :return: The decoded payload, or an empty dictionary for an empty or invalid payload.
+        """
+        if not msg_bytes: # Most Blynk messages are JSON, but some (like info/get) might be empty.
+            return {}
         try:
-            # Most Blynk messages are JSON, but some (like info/get) might be empty.
-            data = json.loads(msg_str) if msg_str else {}
+            return json.loads(msg_bytes) # json.loads accepts the payload bytes directly
         except ValueError: # Handles JSONDecodeError in MicroPython's ujson
-            self.log(f"Error: Failed to decode JSON from topic '{topic_str}': {msg_str}")
-            data = {} # Treat as an empty or invalid payload to prevent crashes
-
-        # Route message based on topic
-        if topic_str == TOPIC_CONTROL:
-            # This topic delivers commands from the Blynk app/server, typically virtual pin writes.
-            # Expected payload: {"pin": "v0", "value": "some_value"} or {"pin": "v1", "value": [val1, val2]}
-            pin_str = data.get("pin")
-            value = data.get("value") # Value can be string, number, list, etc.
-
-            if pin_str and pin_str.lower().startswith("v"): # Check if it's a virtual pin
-                handler_key = pin_str.upper()  # Normalize to "V0", "V1", etc. for handler lookup
-                if handler_key in self._handlers:
-                    try:
-                        self._handlers[handler_key](value) # Call the registered handler
-                    except Exception as e:
-                        self.log(f"Error executing handler for {handler_key}: {e}")
-                else:
-                    self.log(f"Warning: No handler registered for incoming data on {handler_key}")
-            else:
-                self.log(f"Warning: Received unhandled control message structure or non-virtual pin: {data}")
+            self._log("Error: Failed to decode JSON from topic '%s': %s", topic_bytes, msg_bytes)
+            return {} # Treat as an empty or invalid payload to prevent crashes
 
-        elif topic_str == TOPIC_INFO_GET:
-            # Server is requesting device information.
-            # Payload is usually empty.
-            if 'info_get' in self._handlers: # Prioritize user-defined handler
-                try:
-                    self._handlers['info_get']()
-                except Exception as e:
-                    self.log(f"Error executing 'info_get' handler: {e}")
-            else: # Default behavior: publish stored device info
-                self.log("Received info/get request. Responding with stored device info.")
-                self.publish_device_info() # Uses cached values
-
-        elif topic_str == TOPIC_PROPERTY_GET:
-            # Server is requesting the current value of a widget property.
-            # Expected payload: {"pin": "v0", "property": "label"}
-            pin_designator = data.get("pin")
-            prop_name = data.get("property")
-            if 'property_get' in self._handlers:
-                try:
-                    # User handler is responsible for publishing the property back using set_property()
-                    self._handlers['property_get'](pin_designator, prop_name)
-                except Exception as e:
-                    self.log(f"Error executing 'property_get' handler for {pin_designator}.{prop_name}: {e}")
-            else:
-                self.log(f"Warning: Received property_get for {pin_designator}.{prop_name}, but no handler registered. "
-                         "Use blynk.on('property_get', your_handler) to respond.")
-
-        elif topic_str == TOPIC_AUTOMATION_RESPONSE:
-            # Server sends status of a triggered automation.
-            # Expected payload: {"automationId": 123, "status": "success", "message": "Optional details"}
-            automation_id = data.get("automationId")
-            status = data.get("status")
-            message = data.get("message") # Optional field
-            if 'automation_response' in self._handlers:
+    def _handle_control(self, msg_bytes):
+        """
+        Handle a message on the `control` topic: commands from the Blynk app/server,
+        typically virtual pin writes.
+        Expected payload: {"pin": "v0", "value": "some_value"} or {"pin": "v1", "value": [val1, val2]}
+
+        :param msg_bytes: Bytes, the JSON payload. Not parsed if no virtual pin handler is registered.
+        """
+        if self._any_virtual_handler is None and not self._has_pin_handlers and not self._log_enabled:
+            # `handlers_by_pin` is public and may be assigned directly, bypassing `on()`. Scan it
+            # only while no handler is known; once one is found, later messages skip the scan.
+            if not any(self.handlers_by_pin):
+                return # Nothing would use the payload
+            self._has_pin_handlers = True
+        data = self._loads(TOPIC_CONTROL_B, msg_bytes)
+        pin_str = data.get("pin")
+        value = data.get("value") # Value can be string, number, list, etc.
+
+        pin = _parse_vpin(pin_str) # Same parsing as `on()`
+        if pin >= 0:
+            any_handler = self._any_virtual_handler
+            if any_handler is not None and pin <= 255:
+                # A catch-all handler (`on('virtual')`) gets every write; no per-pin lookup
                 try:
-                    self._handlers['automation_response'](automation_id, status, message)
+                    any_handler(pin, value)
                 except Exception as e:
-                    self.log(f"Error executing 'automation_response' handler: {e}")
-            else:
-                self.log(f"Received automation_response for ID {automation_id}, status {status}. No handler registered.")
-        
-        elif topic_str == TOPIC_OTA_REQUEST:
-            # Server sends a command to initiate a custom Over-The-Air update.
-            # Payload structure depends on the custom OTA setup.
-            # Example: {"command": "start", "url": "http://...", "version": "1.1.0"}
-            if 'ota_request' in self._handlers:
+                    self._log("Error executing 'virtual' handler for %s: %s", pin_str, e)
+                return
+            # O(1) lookup by pin number in the table filled by `on()`; no key string is built
+            handler = self.handlers_by_pin[pin] if pin <= 255 else None
+            if handler is not None:
                 try:
-                    self._handlers['ota_request'](data) # Pass the full data dictionary to the handler
+                    handler(value) # Call the registered handler
                 except Exception as e:
-                    self.log(f"Error executing 'ota_request' handler: {e}")
+                    self._log("Error executing handler for %s: %s", pin_str, e)
             else:
-                self.log(f"Received OTA request: {data}. No handler registered. This is for custom OTA implementations.")
+                self._log("Warning: No handler registered for incoming data on %s", pin_str)
         else:
-            # Message on a subscribed topic that doesn't have specific handling logic here.
-            self.log(f"Warning: Received message on an unhandled subscribed topic: {topic_str}")
+            self._log("Warning: Received unhandled control message structure or non-virtual pin: %s", data)
+
+    def _handle_info_get(self, msg_bytes):
+        """
+        Handle a message on the `info/get` topic: the server is requesting device information.
+        Payload is usually empty, so it is not parsed.
+
+        :param msg_bytes: Bytes, the payload (unused).
+        """
+        handler = self._handlers.get(_EV_INFO_GET) # One lookup instead of `in` plus indexing
+        if handler is not None: # Prioritize user-defined handler
+            try:
+                handler()
+            except Exception as e:
+                self._log("Error executing 'info_get' handler: %s", e)
+        else: # Default behavior: publish stored device info
+            self.log("Received info/get request. Responding with stored device info.")
+            self.publish_device_info() # Uses cached values
 
+    def _handle_property_get(self, msg_bytes):
+        """
+        Handle a message on the `property/get` topic: the server is requesting the current
+        value of a widget property.
+        Expected payload: {"pin": "v0", "property": "label"}
+
+        :param msg_bytes: Bytes, the JSON payload. Not parsed if no handler is registered.
+        """
+        handler = self._handlers.get(_EV_PROPERTY_GET)
+        if handler is None and not self._log_enabled:
+            return # Nothing would use the payload
+        data = self._loads(TOPIC_PROPERTY_GET_B, msg_bytes)
+        pin_designator = data.get("pin")
+        prop_name = data.get("property")
+        if handler is not None:
+            try:
+                # User handler is responsible for publishing the property back using set_property()
+                handler(pin_designator, prop_name)
+            except Exception as e:
+                self._log("Error executing 'property_get' handler for %s.%s: %s", pin_designator, prop_name, e)
+        else:
+            self._log("Warning: Received property_get for %s.%s, but no handler registered. "
+                      "Use blynk.on('property_get', your_handler) to respond.", pin_designator, prop_name)
+
+    def _handle_automation_response(self, msg_bytes):
+        """
+        Handle a message on the `automation/response` topic: the status of a triggered automation.
+        Expected payload: {"automationId": 123, "status": "success", "message": "Optional details"}
+
+        :param msg_bytes: Bytes, the JSON payload. Not parsed if no handler is registered.
+        """
+        handler = self._handlers.get(_EV_AUTOMATION_RESPONSE)
+        if handler is None and not self._log_enabled:
+            return # Nothing would use the payload
+        data = self._loads(TOPIC_AUTOMATION_RESPONSE_B, msg_bytes)
+        automation_id = data.get("automationId")
+        status = data.get("status")
+        message = data.get("message") # Optional field
+        if handler is not None:
+            try:
+                handler(automation_id, status, message)
+            except Exception as e:
+                self._log("Error executing 'automation_response' handler: %s", e)
+        else:
+            self._log("Received automation_response for ID %s, status %s. No handler registered.", automation_id, status)
+
+    def _handle_ota_request(self, msg_bytes):
+        """
+        Handle a message on the `ota/request` topic: a command to initiate a custom Over-The-Air update.
+        Payload structure depends on the custom OTA setup.
+        Example: {"command": "start", "url": "http://...", "version": "1.1.0"}
+
+        :param msg_bytes: Bytes, the JSON payload. Not parsed if no handler is registered.
+        """
+        handler = self._handlers.get(_EV_OTA_REQUEST)
+        if handler is None and not self._log_enabled:
+            return # Nothing would use the payload
+        data = self._loads(TOPIC_OTA_REQUEST_B, msg_bytes)
+        if handler is not None:
+            try:
+                handler(data) # Pass the full data dictionary to the handler
+            except Exception as e:
+                self._log("Error executing 'ota_request' handler: %s", e)
+        else:
+            self._log("Received OTA request: %s. No handler registered. This is for custom OTA implementations.", data)
 
     def connect(self, clean_session=True):
         """
@@ -271,65 +568,129 @@ class BlynkMQTT:
             self.log("Already connected to MQTT.")
             return True
         
-        self.log(f"Attempting to connect to MQTT broker: {self.server}:{self.port} as client '{self.client_id}'...")
+        self._log("Attempting to connect to MQTT broker: %s:%s as client '%s'...", self.server, self.port, self.client_id)
         try:
             # Establish connection to the MQTT broker
             self.mqtt.connect(clean_session=clean_session)
             self.log("MQTT client connected to broker.")
             
-            # Subscribe to topics for receiving data/commands from Blynk
-            # Note: Topics must be encoded to bytes for umqtt.simple's subscribe method.
-            
-            # Essential for receiving widget commands, virtual pin writes from app/server
-            self.mqtt.subscribe(TOPIC_CONTROL.encode('utf-8'))
-            self.log(f"Subscribed to: {TOPIC_CONTROL}")
-            
-            # For server requests for device information
-            self.mqtt.subscribe(TOPIC_INFO_GET.encode('utf-8'))
-            self.log(f"Subscribed to: {TOPIC_INFO_GET}")
-
-            # For server requests for widget property values
-            self.mqtt.subscribe(TOPIC_PROPERTY_GET.encode('utf-8'))
-            self.log(f"Subscribed to: {TOPIC_PROPERTY_GET}")
-
-            # For receiving status updates about triggered automations
-            self.mqtt.subscribe(TOPIC_AUTOMATION_RESPONSE.encode('utf-8'))
-            self.log(f"Subscribed to: {TOPIC_AUTOMATION_RESPONSE}")
-
-            # For receiving OTA commands (if custom OTA is implemented)
-            self.mqtt.subscribe(TOPIC_OTA_REQUEST.encode('utf-8'))
-            self.log(f"Subscribed to: {TOPIC_OTA_REQUEST}")
+            # Subscribe to topics for receiving data/commands from Blynk.
+            # All topics go out in a single SUBSCRIBE packet (one round-trip), see `_subscribe_many`.
+            self._subscribe_many(_SUBSCRIBE_TOPICS)
+            if self._log_enabled: # Skip the loop entirely without a logger
+                for topic in _SUBSCRIBE_TOPICS:
+                    self._log("Subscribed to: %s", topic)
             
             self.connected = True # Update connection state
-            self._last_activity_ms = time.ticks_ms()
+            self._last_activity_ms = self._last_tx_ms = time.ticks_ms()
 
             # Call user-defined 'connect' handler, if registered
-            if 'connect' in self._handlers:
+            handler = self._handlers.get(_EV_CONNECT)
+            if handler is not None:
                 try:
-                    self._handlers['connect']()
+                    handler()
                 except Exception as e:
-                    self.log(f"Error executing 'connect' handler: {e}")
+                    self._log("Error executing 'connect' handler: %s", e)
             self.log("Successfully connected and subscribed to Blynk topics.")
             
             # After successful connection, publish initial device info if available
-            if self._device_info.get("board") or self._device_info.get("firmwareVersion") or self._device_info.get("appName"):
+            if any(self._device_info.values()):
                 self.log("Publishing initial device info...")
                 self.publish_device_info() # Uses cached values from __init__
             return True
             
         except OSError as e:  # OSError is common for network/socket issues in MicroPython
-            self.log(f"Error: MQTT Connection failed (OSError): {e}")
+            self._log("Error: MQTT Connection failed (OSError): %s", e)
         except Exception as e: # Catch any other unexpected errors during connection
-            self.log(f"Error: MQTT Connection failed with unexpected error: {e}")
+            self._log("Error: MQTT Connection failed with unexpected error: %s", e)
         
         # If connection failed
         self.connected = False
         # Call user-defined 'disconnect' handler on failed connect attempt, if registered
-        if 'disconnect' in self._handlers:
+        handler = self._handlers.get(_EV_DISCONNECT)
+        if handler is not None:
             try:
-                self._handlers['disconnect']()
+                handler()
             except Exception as e_handler:
-                self.log(f"Error executing 'disconnect' handler during connect failure: {e_handler}")
+                self._log("Error executing 'disconnect' handler during connect failure: %s", e_handler)
+        return False
+
+    def _subscribe_many(self, topics, qos=0):
+        """
+        Subscribe to several topics with a single MQTT SUBSCRIBE packet and wait for its SUBACK.
+        `umqtt.simple` only subscribes to one topic per packet, each waiting for its own SUBACK;
+        MQTT 3.1.1 allows several topic filters in one packet, so this saves a round-trip per topic.
+        Falls back to one `subscribe()` call per topic if the MQTT client does not expose the
+        socket and packet id this needs, and retries individually any topic the broker rejected.
+
+        :param topics: Sequence of topics (bytes) to subscribe to.
+        :param qos: Integer, the requested QoS level for all topics.
+        :raises OSError: On network errors (handled by `connect`).
+        """
+        mqtt = self.mqtt
+        sock = getattr(mqtt, "sock", None)
+        if sock is None or not hasattr(mqtt, "pid") or not hasattr(mqtt, "wait_msg"):
+            for topic in topics:
+                mqtt.subscribe(topic, qos)
+            return
+
+        mqtt.pid = mqtt.pid % 0xFFFF + 1 # Packet id, 1-65535
+        pid = mqtt.pid.to_bytes(2, "big")
+        body = bytearray(pid)
+        for topic in topics: # Payload: (length, topic filter, requested QoS) per topic
+            body += len(topic).to_bytes(2, "big")
+            body += topic
+            body.append(qos)
+        pkt = bytearray(b"\x82") # SUBSCRIBE control packet header
+        n = len(body)
+        while True: # Remaining length, MQTT variable-length encoding
+            byte = n & 0x7F
+            n >>= 7
+            pkt.append(byte | 0x80 if n else byte)
+            if not n:
+                break
+        pkt += body
+        sock.write(pkt)
+
+        # Wait for the SUBACK. Other packets (e.g. PUBLISH) are handled by wait_msg() meanwhile.
+        while mqtt.wait_msg() != 0x90:
+            pass
+        size, shift = 0, 0
+        while True: # wait_msg() only read the SUBACK's first byte; read its remaining length
+            byte = sock.read(1)[0]
+            size |= (byte & 0x7F) << shift
+            if not byte & 0x80:
+                break
+            shift += 7
+        resp = sock.read(size) # Packet id followed by one return code per topic
+        if resp[:2] != pid:
+            raise OSError("Unexpected SUBACK packet id")
+        for topic, code in zip(topics, resp[2:]):
+            if code == 0x80: # Rejected by the broker; retry with a separate SUBSCRIBE
+                self._log("Warning: Broker rejected subscription to %s. Retrying individually.", topic)
+                mqtt.subscribe(topic, qos)
+
+    def reconnect(self, max_retries=8, base=1, cap=60):
+        """
+        Try to (re)connect, waiting geometrically longer between failed attempts
+        (`base`, 2*`base`, 4*`base`, ... seconds, at most `cap`). Backing off keeps a device
+        on a flaky link from hammering the broker during an outage.
+
+        :param max_retries: Maximum number of connection attempts, or None to retry until connected.
+        :param base: Delay in seconds after the first failed attempt.
+        :param cap: Upper bound in seconds for the delay between attempts.
+        :return: True once connected, False if all attempts failed.
+        """
+        attempt = 0
+        while max_retries is None or attempt < max_retries:
+            if self.connect():
+                return True
+            attempt += 1
+            if max_retries is not None and attempt >= max_retries:
+                break # No point waiting after the last attempt
+            delay = min(cap, base * (1 << min(attempt - 1, 16))) # Shift bounded so it stays a small int
+            self._log("Reconnect attempt %s failed. Retrying in %ss...", attempt, delay)
+            time.sleep(delay)
         return False
 
     def disconnect(self):
@@ -338,19 +699,24 @@ class BlynkMQTT:
         Calls the user-defined 'disconnect' handler if registered.
         """
         if self.connected:
+            if self._batch is not None: # Put the real socket back; batched data is dropped
+                self.mqtt.sock = self._batch.sock
+                self._batch = None
+                self.log("Warning: Discarding unsent batched publishes on disconnect.")
             try:
                 self.mqtt.disconnect()
                 self.log("Disconnected from MQTT broker.")
             except Exception as e:
-                self.log(f"Error during MQTT disconnect: {e}")
+                self._log("Error during MQTT disconnect: %s", e)
             finally:
                 self.connected = False # Ensure state is updated even if disconnect call fails
                 # Call user-defined 'disconnect' handler
-                if 'disconnect' in self._handlers:
+                handler = self._handlers.get(_EV_DISCONNECT)
+                if handler is not None:
                     try:
-                        self._handlers['disconnect']()
+                        handler()
                     except Exception as e_handler:
-                        self.log(f"Error executing 'disconnect' handler: {e_handler}")
+                        self._log("Error executing 'disconnect' handler: %s", e_handler)
         else:
             self.log("Already disconnected. No action taken.")
 
@@ -366,6 +732,9 @@ class BlynkMQTT:
           - 'V<pin>': (e.g., 'V0', 'V12') Called when data is written to the specified
                        virtual pin from the Blynk app or server. The handler function
                        will receive the value(s) written to the pin.
+          - 'virtual': Handler signature: `handler(pin_number, value)`. Called for writes to
+                       any virtual pin, with the pin as an integer. Useful for routing all pins
+                       through one function. While registered, it replaces the 'V<pin>' handlers.
           - 'info_get': Called when the Blynk server requests device information.
                         If no handler is registered, the SDK automatically responds with
                         information provided during `__init__` or `publish_device_info`.
@@ -387,21 +756,24 @@ class BlynkMQTT:
         :raises ValueError: If `event_name` for a virtual pin is invalid (e.g., pin number out of range).
         """
         def decorator(f):
-            # Normalize virtual pin event names to uppercase (e.g., "v0" -> "V0")
-            event_key = event_name.upper() if event_name.lower().startswith('v') else event_name.lower()
-            
-            # Validate virtual pin numbers
-            if event_key.startswith('V') and event_key[1:].isdigit():
-                pin = int(event_key[1:])
-                if not (0 <= pin <= 255): # Blynk virtual pins are typically 0-255
+            # Parse the name once: 'V<pin>'/'v<pin>' is a virtual pin, anything else an event name
+            pin = _parse_vpin(event_name)
+            if pin >= 0:
+                if pin > 255: # Blynk virtual pins are typically 0-255
                     raise ValueError("Virtual pin number must be between 0 and 255 for 'on' event.")
-            # Check against known event types for logging unrecognized ones
-            elif event_key not in ['connect', 'disconnect', 'info_get', 'property_get', 
-                                   'automation_response', 'ota_request']:
-                self.log(f"Warning: Registering handler for potentially unknown event name '{event_name}'.")
-            
+                self.handlers_by_pin[pin] = f
+                self._has_pin_handlers = True
+                event_key = "V%d" % pin # Normalized key (e.g., "v07" -> "V7")
+            else:
+                event_key = event_name.lower()
+                if event_key == _EV_VIRTUAL: # Catch-all handler for all virtual pins
+                    self._any_virtual_handler = f
+                # Check against known event types for logging unrecognized ones
+                elif event_key not in _KNOWN_EVENTS:
+                    self._log("Warning: Registering handler for potentially unknown event name '%s'.", event_name)
+
             self._handlers[event_key] = f
-            self.log(f"Registered handler for event: '{event_key}'")
+            self._log("Registered handler for event: '%s'", event_key)
             return f
 
         if func: # If used as blynk.on("event", my_func)
@@ -411,9 +783,9 @@ class BlynkMQTT:
     def _publish(self, topic, payload_obj, qos=0, retain=False):
         """
         Internal helper method to publish an MQTT message with a JSON payload.
-        Handles JSON serialization and MQTT publishing.
+        Handles JSON serialization, then hands the encoded bytes to `_publish_raw`.
 
-        :param topic: String, the MQTT topic to publish to.
+        :param topic: Bytes, the MQTT topic to publish to (one of the pre-encoded `TOPIC_*_B` constants).
         :param payload_obj: Python object (e.g., dict, list, string, number) to be
                             serialized to JSON and sent as the message payload.
         :param qos: Integer, MQTT Quality of Service level (0 or 1). `umqtt.simple`
@@ -423,23 +795,49 @@ class BlynkMQTT:
         :return: True if publishing was successful, False otherwise.
         """
         if not self.connected:
-            self.log(f"Error: Cannot publish to '{topic}'. Not connected to MQTT broker.")
+            self._log("Error: Cannot publish to '%s'. Not connected to MQTT broker.", topic)
             return False
         try:
-            payload_str = json.dumps(payload_obj) # Serialize payload to JSON string
-            self.log(f"MQTT TX: Topic='{topic}', Payload='{payload_str}', QoS={qos}, Retain={retain}")
-            self.mqtt.publish(topic.encode('utf-8'), payload_str.encode('utf-8'), retain=retain, qos=qos)
-            self._last_activity_ms = time.ticks_ms() # Update activity timestamp
+            # The bytes go to `_publish_raw` unchanged and are only decoded again for the TX log.
+            payload_bytes = _dumps(payload_obj) # Serialize payload to JSON bytes
+        except Exception as e: # Handle serialization errors (e.g., unsupported types)
+            self._log("Error: MQTT Publish to '%s' failed: %s", topic, e)
+            return False
+        return self._publish_raw(topic, payload_bytes, qos=qos, retain=retain)
+
+    def _publish_raw(self, topic, payload_bytes, qos=0, retain=False):
+        """
+        Internal helper method to publish an already-encoded payload, skipping JSON serialization.
+        Used by `_publish` and by callers that cache their encoded payloads.
+
+        :param topic: Bytes, the MQTT topic to publish to (one of the pre-encoded `TOPIC_*_B` constants).
+        :param payload_bytes: Bytes, the encoded message payload (typically JSON).
+        :param qos: Integer, MQTT Quality of Service level (0 or 1).
+        :param retain: Boolean, MQTT retain flag.
+        :return: True if publishing was successful, False otherwise.
+        """
+        if not self.connected:
+            self._log("Error: Cannot publish to '%s'. Not connected to MQTT broker.", topic)
+            return False
+        if qos and self._batch is not None:
+            # QoS 1 waits for a PUBACK on the real socket, so send what is batched first.
+            self._flush_batch()
+            if not self.connected:
+                return False
+        try:
+            self._log("MQTT TX: Topic='%s', Payload='%s', QoS=%s, Retain=%s", topic, payload_bytes, qos, retain)
+            self.mqtt.publish(topic, payload_bytes, retain=retain, qos=qos)
+            self._last_activity_ms = self._last_tx_ms = time.ticks_ms() # Update activity timestamps
             return True
         except OSError as e: # Handle network errors during publish
-            self.log(f"Error: MQTT Publish to '{topic}' failed (OSError): {e}. Assuming disconnection.")
+            self._log("Error: MQTT Publish to '%s' failed (OSError): %s. Assuming disconnection.", topic, e)
             self.disconnect() # A publish error often means the connection is lost
             return False
-        except Exception as e: # Handle other errors (e.g., JSON serialization)
-            self.log(f"Error: MQTT Publish to '{topic}' failed: {e}")
+        except Exception as e: # Handle other unexpected errors
+            self._log("Error: MQTT Publish to '%s' failed: %s", topic, e)
             return False
 
-    def virtual_write(self, pin_number, *values):
+    def virtual_write(self, pin_number, *values, qos=0):
         """
         Send data from the device to a Virtual Pin on the Blynk app/server.
 
@@ -448,7 +846,10 @@ class BlynkMQTT:
                        If a single value is provided, it's sent directly.
                        If multiple values are provided, they are sent as a JSON array.
                        If no values are provided, `null` might be sent depending on JSON conversion.
+        :param qos: Keyword-only. MQTT QoS level for the publish (default 0). QoS 0 needs no
+                    PUBACK round-trip and suits periodic telemetry; use 1 if delivery must be confirmed.
         :return: True if the message was published successfully, False otherwise.
+                 In buffered mode, QoS 0 values are only queued (see `flush`) and True is returned.
         :raises TypeError: If `pin_number` is not an integer.
         :raises ValueError: If `pin_number` is outside the valid range (0-255).
         """
@@ -461,7 +862,7 @@ class BlynkMQTT:
             # Blynk typically expects a value. Sending None (JSON null) or an empty string
             # might be options, or logging a warning.
             # For simplicity, if no values, we send a single None.
-            self.log(f"Warning: virtual_write for V{pin_number} called with no values. Sending null.")
+            self._log("Warning: virtual_write for V%s called with no values. Sending null.", pin_number)
             value_to_send = None
         elif len(values) == 1:
             value_to_send = values[0] # Single value
@@ -470,22 +871,145 @@ class BlynkMQTT:
         
         # The payload for data stream is a JSON object where keys are "v<pin>"
         # and values are the data for that pin.
-        payload = {f"v{pin_number}": value_to_send}
-        return self._publish(TOPIC_DATA_STREAM, payload)
+        if self.buffered and not qos:
+            if not self.connected:
+                return False
+            pending = self._pending_stream
+            if not pending:
+                self._pending_since_ms = time.ticks_ms()
+            pending["v%d" % pin_number] = value_to_send # A newer value for the same pin replaces the older one
+            if len(pending) >= self.batch_max:
+                return self.flush()
+            return True
+        return self._publish_pin(pin_number, value_to_send, qos=qos)
 
-    def notify(self, message):
+    def virtual_write_fast(self, pin_number, value):
+        """
+        Send a single value to a Virtual Pin with minimal argument checks.
+        For tight sensor loops where the caller knows `pin_number` is an integer: skips the
+        type check and value packing of `virtual_write`, and is always published immediately
+        as QoS 0 (also in buffered mode, where any value still queued for the pin is discarded
+        so it can't overwrite this one later). The range is still checked, since an out-of-range
+        pin would otherwise be published to a different datastream.
+
+        :param pin_number: Integer, the virtual pin number (0-255). Its type is not checked.
+        :param value: The value to send to the pin.
+        :return: True if the message was published successfully, False otherwise.
+        :raises ValueError: If `pin_number` is outside the valid range (0-255).
+        """
+        if not (0 <= pin_number <= 255):
+            raise ValueError("Virtual pin number must be between 0 and 255.")
+        return self._publish_pin(pin_number, value)
+
+    def _publish_pin(self, pin_number, value, qos=0):
+        """
+        Publish `{"v<pin_number>": value}` to the data stream. The payload is assembled directly
+        in the reusable `_tx_buf` instead of building a dict and serializing it with `_dumps`;
+        only the value itself is JSON-encoded. A value still queued for the same pin in
+        buffered mode is discarded, so `run()`/`flush()` can't later overwrite this newer one.
+
+        :param pin_number: Integer, a valid virtual pin number (0-255).
+        :param value: The JSON-compatible value to send.
+        :param qos: Integer, MQTT QoS level.
+        :return: True if the message was published successfully, False otherwise.
+        """
+        if self._pending_stream: # Only in buffered mode with values queued
+            self._pending_stream.pop("v%d" % pin_number, None)
+        buf = self._tx_buf
+        buf[:] = b'{"v'
+        if pin_number >= 100: # Pin number as ASCII digits, without formatting a string
+            buf.append(48 + pin_number // 100)
+        if pin_number >= 10:
+            buf.append(48 + pin_number // 10 % 10)
+        buf.append(48 + pin_number % 10)
+        buf += b'":'
+        return self._publish_value(TOPIC_DATA_STREAM_B, value, qos)
+
+    def _publish_value(self, topic, value, qos=0):
+        """
+        Finish the single-member JSON object started in `_tx_buf` by appending the encoded
+        `value` and the closing brace, then publish it to `topic`. The MQTT client gets an
+        immutable copy of the buffer, as it may keep the payload (e.g. for a retransmit)
+        while `_tx_buf` is reused by the next publish.
+
+        :return: True if the message was published successfully, False otherwise.
+        """
+        if not self.connected:
+            self._log("Error: Cannot publish to '%s'. Not connected to MQTT broker.", topic)
+            return False
+        try:
+            encoded = _dumps(value)
+        except Exception as e: # Handle serialization errors (e.g., unsupported types)
+            self._log("Error: MQTT Publish to '%s' failed: %s", topic, e)
+            return False
+        buf = self._tx_buf
+        buf += encoded
+        buf += b'}'
+        return self._publish_raw(topic, bytes(buf), qos=qos)
+
+    def flush(self):
+        """
+        Send the virtual pin values queued by `virtual_write` in buffered mode now, as a single
+        `data/stream` message. `run()` calls this automatically once `idle_flush_ms` has passed
+        since the first queued value, and `virtual_write` once `batch_max` pins are queued.
+
+        :return: True if the values were published (or nothing was queued), False otherwise.
+        """
+        pending = self._pending_stream
+        if not pending:
+            return True
+        self._pending_stream = {}
+        return self._publish(TOPIC_DATA_STREAM_B, pending)
+
+    def virtual_write_batch(self, pin_values, qos=0):
+        """
+        Send values for several Virtual Pins in a single MQTT message.
+        All pins are packed into one `data/stream` payload (e.g. `{"v5": 1, "v99": 120}`),
+        so only one MQTT PUBLISH is sent instead of one per pin.
+
+        :param pin_values: Dictionary mapping integer virtual pin numbers (0-255) to the
+                           value to send to that pin. Example: `{5: counter, 99: uptime_s}`
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
+        :return: True if the message was published successfully, False otherwise
+                 (including when `pin_values` is empty).
+        :raises TypeError: If `pin_values` is not a dictionary or a pin number is not an integer.
+        :raises ValueError: If a pin number is outside the valid range (0-255).
+        """
+        if not isinstance(pin_values, dict):
+            raise TypeError("Values for virtual_write_batch must be a dictionary of {pin_number: value}.")
+
+        payload = {}
+        for pin_number, value in pin_values.items():
+            if not isinstance(pin_number, int):
+                raise TypeError("Virtual pin number must be an integer.")
+            if not (0 <= pin_number <= 255):
+                raise ValueError("Virtual pin number must be between 0 and 255.")
+            payload["v%d" % pin_number] = value
+
+        if not payload:
+            self.log("Warning: virtual_write_batch called with no values. Nothing to send.")
+            return False
+        pending = self._pending_stream
+        if pending: # Drop older buffered values for these pins (see `_publish_pin`)
+            for key in payload:
+                pending.pop(key, None)
+        return self._publish(TOPIC_DATA_STREAM_B, payload, qos=qos)
+
+    def notify(self, message, qos=0):
         """
         Send a push notification to the Blynk app associated with this device's auth token.
 
         :param message: String, the message content of the notification.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the notification message was published successfully, False otherwise.
         """
-        if not isinstance(message, str):
+        if type(message) is not str:
             message = str(message) # Ensure message is a string
-        payload = {"body": message} # Payload format for notifications
-        return self._publish(TOPIC_NOTIFICATIONS, payload)
+        # Payload format for notifications: {"body": message}, assembled in the reusable buffer
+        self._tx_buf[:] = b'{"body":'
+        return self._publish_value(TOPIC_NOTIFICATIONS_B, message, qos=qos)
 
-    def set_property(self, pin_designator, property_name, value):
+    def set_property(self, pin_designator, property_name, value, qos=0):
         """
         Set a property of a widget in the Blynk app (e.g., label, color, min/max values).
 
@@ -494,6 +1018,7 @@ class BlynkMQTT:
         :param property_name: String, the name of the property to set (e.g., "label", "color", "min", "max").
                               Refer to Blynk documentation for available properties for each widget.
         :param value: The value to set for the property. Can be a string, number, or other JSON-compatible type.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the property update message was published successfully, False otherwise.
         :raises TypeError: If `pin_designator` or `property_name` are not strings.
         """
@@ -503,80 +1028,80 @@ class BlynkMQTT:
             raise TypeError("Property name for set_property must be a string.")
             
         payload = {"pin": pin_designator, "property": property_name, "value": value}
-        return self._publish(TOPIC_PROPERTY_UPDATE, payload)
+        return self._publish(TOPIC_PROPERTY_UPDATE_B, payload, qos=qos)
 
-    def log_event(self, event_code, description=""):
+    def log_event(self, event_code, description="", qos=0):
         """
         Log an event to the Blynk device's timeline in the app or web dashboard.
 
         :param event_code: String, a code or name for the event (e.g., "device_rebooted", "sensor_alert").
         :param description: Optional string, a more detailed description of the event.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the event message was published successfully, False otherwise.
         """
-        payload = {"name": str(event_code)} # Event code is mandatory
+        # Event code is mandatory. `type() is` checks skip the str() call for strings.
+        payload = {"name": event_code if type(event_code) is str else str(event_code)}
         if description: # Description is optional
-            payload["description"] = str(description)
-        return self._publish(TOPIC_EVENT, payload)
+            payload["description"] = description if type(description) is str else str(description)
+        return self._publish(TOPIC_EVENT_B, payload, qos=qos)
 
     def publish_device_info(self, board=None, fw_version=None, app_name=None):
         """
         Publish static device information to Blynk (e.g., board type, firmware version).
         This information can be viewed in the Blynk console.
         If parameters are provided, they update the SDK's internal cache of this info.
-        If no parameters are provided, it publishes the currently cached info.
+        While the info is unchanged, the JSON-encoded payload from the previous call is reused.
 
         :param board: Optional. String, the type of board (e.g., "ESP32", "RP2040").
         :param fw_version: Optional. String, the firmware version (e.g., "1.0.1").
         :param app_name: Optional. String, a name for the application/firmware (e.g., "MyProject/1.2.3").
         :return: True if the device info message was published successfully, False if no info to publish or error.
         """
-        payload = {}
-        # Update internal cache and build payload if new values are provided
-        if board is not None: 
-            payload["board"] = str(board)
-            self._device_info["board"] = str(board) # Cache it
-        elif self._device_info["board"] is not None: # Use cached if not provided in call
-             payload["board"] = self._device_info["board"]
-
-        if fw_version is not None:
-            payload["firmwareVersion"] = str(fw_version)
-            self._device_info["firmwareVersion"] = str(fw_version) # Cache it
-        elif self._device_info["firmwareVersion"] is not None:
-            payload["firmwareVersion"] = self._device_info["firmwareVersion"]
-
-        if app_name is not None:
-            payload["appName"] = str(app_name)
-            self._device_info["appName"] = str(app_name) # Cache it
-        elif self._device_info["appName"] is not None:
-            payload["appName"] = self._device_info["appName"]
-            
+        info = self._device_info
+        # Update internal cache if new values are provided
+        _pack(info, ("board", _str(board)), ("firmwareVersion", _str(fw_version)), ("appName", _str(app_name)))
+
+        key = (info["board"], info["firmwareVersion"], info["appName"])
+        if key == self._device_info_cache[0]:
+            # Device info rarely changes, so repeated info/get requests reuse the encoded payload
+            return self._publish_raw(TOPIC_INFO_UPDATE_B, self._device_info_cache[1])
+
+        # Build the payload from the cached fields that have a value
+        payload = {name: value for name, value in info.items() if value is not None}
         if not payload: # If no board or firmware version info is available at all
             self.log("Warning: publish_device_info called, but no information (board, fw_version, appName) is available to send.")
             return False
-            
         # According to docs, at least one field should be present.
         # Typically 'board' and 'firmwareVersion' are common.
-        return self._publish(TOPIC_INFO_UPDATE, payload)
+        try:
+            payload_bytes = _dumps(payload)
+        except Exception as e:
+            self._log("Error: Encoding device info failed: %s", e)
+            return False
+        self._device_info_cache = (key, payload_bytes)
+        return self._publish_raw(TOPIC_INFO_UPDATE_B, payload_bytes)
 
-    def bridge_virtual_write(self, target_token, pin_designator, value):
+    def bridge_virtual_write(self, target_token, pin_designator, value, qos=0):
         """
         Send a value to a virtual pin on another Blynk device using the Bridge feature.
 
         :param target_token: String, the authentication token of the target device.
         :param pin_designator: String, the virtual pin on the target device (e.g., "v0", "v12").
         :param value: The value to send to the target device's virtual pin.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the bridge request was published successfully, False otherwise.
         :raises TypeError: If `target_token` or `pin_designator` are not strings.
         """
-        if not isinstance(target_token, str):
+        if type(target_token) is not str:
             raise TypeError("Target token for bridge_virtual_write must be a string.")
-        if not isinstance(pin_designator, str) or not pin_designator.lower().startswith('v'):
+        # First-character check (as in `_parse_vpin`); no lowercased copy is allocated
+        if type(pin_designator) is not str or not pin_designator or pin_designator[0] not in 'vV':
             raise TypeError("Pin designator for bridge_virtual_write must be a virtual pin string (e.g., 'v0').")
             
         payload = {"targetToken": target_token, "pin": pin_designator, "value": value}
-        return self._publish(TOPIC_BRIDGE_REQUEST, payload)
+        return self._publish(TOPIC_BRIDGE_REQUEST_B, payload, qos=qos)
 
-    def publish_location(self, lat, lon, alt=None, hdop=None):
+    def publish_location(self, lat, lon, alt=None, hdop=None, qos=0):
         """
         Publish the device's geographical location (GPS coordinates) to Blynk.
 
@@ -584,51 +1109,73 @@ class BlynkMQTT:
         :param lon: Float or String, longitude of the device.
         :param alt: Optional. Float or String, altitude in meters.
         :param hdop: Optional. Float or String, Horizontal Dilution of Precision (GPS accuracy measure).
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the location message was published successfully, False otherwise.
         """
-        payload = {"lat": lat, "lon": lon} # Latitude and Longitude are mandatory
-        if alt is not None: payload["alt"] = alt
-        if hdop is not None: payload["hdop"] = hdop
-        return self._publish(TOPIC_LOCATION_UPDATE, payload)
+        if alt is None and hdop is None: # Common case for GPS samples: latitude/longitude only
+            return self._publish(TOPIC_LOCATION_UPDATE_B, {"lat": lat, "lon": lon}, qos=qos)
+        # Latitude and Longitude are mandatory
+        return self._publish(TOPIC_LOCATION_UPDATE_B, _pack({"lat": lat, "lon": lon}, ("alt", alt), ("hdop", hdop)), qos=qos)
 
-    def publish_metadata(self, metadata_dict):
+    def publish_metadata(self, metadata_dict, qos=0):
         """
         Publish custom metadata as a dictionary of key-value pairs to Blynk.
         This metadata can be viewed in the device details in the Blynk console.
 
         :param metadata_dict: Dictionary of metadata. Keys and values should be strings or numbers.
                               Example: `{"sensorModel": "DHT22", "serialNumber": "SN12345"}`
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the metadata message was published successfully, False otherwise.
         :raises TypeError: If `metadata_dict` is not a dictionary.
         """
         if not isinstance(metadata_dict, dict):
             raise TypeError("Metadata for publish_metadata must be a dictionary.")
-        return self._publish(TOPIC_METADATA_UPDATE, metadata_dict)
+        return self._publish(TOPIC_METADATA_UPDATE_B, metadata_dict, qos=qos)
+
+    def publish_metadata_raw(self, metadata_json):
+        """
+        Publish custom metadata that has already been serialized to JSON.
+        For metadata that never changes, serialize it once (e.g. `ujson.dumps(d).encode()`)
+        and pass the same bytes on every (re)connect, so it is not re-encoded each time.
+
+        :param metadata_json: Bytes (or string) containing a JSON object of key-value pairs.
+        :return: True if the metadata message was published successfully, False otherwise.
+        :raises TypeError: If `metadata_json` is not bytes or a string.
+        """
+        if isinstance(metadata_json, str):
+            metadata_json = metadata_json.encode('utf-8')
+        elif not isinstance(metadata_json, (bytes, bytearray)):
+            raise TypeError("Metadata for publish_metadata_raw must be JSON bytes or a JSON string.")
+        return self._publish_raw(TOPIC_METADATA_UPDATE_B, metadata_json)
 
-    def trigger_automation(self, automation_id, state=None, value=None):
+    def trigger_automation(self, automation_id, state=None, value=None, qos=0):
         """
         Trigger a pre-configured Blynk automation by its ID.
 
         :param automation_id: Integer, the ID of the automation to trigger.
         :param state: Optional. String, for automations that act like a switch (e.g., "on", "off").
         :param value: Optional. Any JSON-compatible value, for automations that expect a specific value.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the automation trigger message was published successfully, False otherwise.
         :raises TypeError: If `automation_id` is not an integer.
         """
-        if not isinstance(automation_id, int):
+        if type(automation_id) is not int:
             raise TypeError("Automation ID for trigger_automation must be an integer.")
             
+        # Each optional argument is checked once; the warning is on the (rare) branch with neither
         payload = {"automationId": automation_id}
-        if state is not None: payload["state"] = str(state)
-        if value is not None: payload["value"] = value
-        
-        if state is None and value is None:
+        if state is not None:
+            payload["state"] = state if type(state) is str else str(state)
+            if value is not None: payload["value"] = value
+        elif value is not None:
+            payload["value"] = value
+        else:
             # While the API might allow this (triggering with just ID), it's often less useful.
-            self.log(f"Warning: trigger_automation for ID {automation_id} called without 'state' or 'value'.")
-            
-        return self._publish(TOPIC_AUTOMATION_TRIGGER, payload)
+            self._log("Warning: trigger_automation for ID %s called without 'state' or 'value'.", automation_id)
+
+        return self._publish(TOPIC_AUTOMATION_TRIGGER_B, payload, qos=qos)
 
-    def device_log(self, level, message):
+    def device_log(self, level, message, qos=0):
         """
         Send a log message to Blynk's internal device logging system.
         These logs are typically used for debugging and monitoring device behavior from the Blynk console,
@@ -637,16 +1184,19 @@ class BlynkMQTT:
         :param level: String, the severity level of the log message. Must be one of:
                       "trace", "debug", "info", "warn", "error".
         :param message: String, the content of the log message.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the log message was published successfully, False otherwise.
         :raises ValueError: If an invalid `level` is provided.
         """
-        valid_levels = ["trace", "debug", "info", "warn", "error"]
-        if level not in valid_levels:
-            raise ValueError(f"Invalid level '{level}' for device_log. Must be one of {valid_levels}.")
-        payload = {"level": level, "message": str(message)} # Ensure message is a string
-        return self._publish(TOPIC_DEVICE_LOG, payload)
+        # The lookup also validates the level; non-strings (possibly unhashable) are rejected first
+        prefix = _LOG_PREFIX.get(level) if isinstance(level, str) else None
+        if prefix is None:
+            raise ValueError(f"Invalid level '{level}' for device_log. Must be one of trace, debug, info, warn, error.")
+        # Payload {"level": level, "message": message}, assembled in the reusable buffer
+        self._tx_buf[:] = prefix
+        return self._publish_value(TOPIC_DEVICE_LOG_B, message if type(message) is str else str(message), qos=qos) # Ensure message is a string
         
-    def publish_ota_status(self, status, version=None, size=None, error_code=None, error_msg=None):
+    def publish_ota_status(self, status, version=None, size=None, error_code=None, error_msg=None, qos=0):
         """
         Publish status updates during a custom Over-The-Air (OTA) firmware update process.
         This is intended for use with user-implemented OTA logic, not Blynk's built-in OTA.
@@ -657,44 +1207,205 @@ class BlynkMQTT:
         :param size: Optional. Integer, the size of the firmware in bytes.
         :param error_code: Optional. Integer, an error code if the OTA process failed.
         :param error_msg: Optional. String, a descriptive error message if the OTA process failed.
+        :param qos: MQTT QoS level for the publish (default 0). See `virtual_write`.
         :return: True if the OTA status message was published successfully, False otherwise.
         """
-        payload = {"status": str(status)} # Status is mandatory
-        if version is not None: payload["version"] = str(version)
-        if size is not None: payload["size"] = int(size)
-        if error_code is not None: payload["errorCode"] = int(error_code)
-        if error_msg is not None: payload["errorMessage"] = str(error_msg)
-        
-        self.log(f"Publishing OTA Status: {payload} (Note: This is for custom OTA implementations)")
-        return self._publish(TOPIC_OTA_UPDATE, payload)
+        payload = _pack({"status": status if type(status) is str else str(status)}, # Status is mandatory, never omitted
+                        ("version", _str(version)),
+                        ("size", _int(size)),
+                        ("errorCode", _int(error_code)),
+                        ("errorMessage", _str(error_msg)))
+
+        self._log("Publishing OTA Status: %s (Note: This is for custom OTA implementations)", payload)
+        return self._publish(TOPIC_OTA_UPDATE_B, payload, qos=qos)
+
+    def _begin_batch(self):
+        """
+        Start batching outgoing publishes. Until `_flush_batch()` is called, the MQTT packets
+        produced by QoS 0 publishes are collected in memory instead of being written to the
+        socket one by one, so a group of publishes leaves the device as a single socket write
+        (fewer TCP segments / TLS records). Does nothing if not connected or already batching.
+        """
+        if self._batch is not None or not self.connected:
+            return
+        sock = getattr(self.mqtt, "sock", None)
+        if sock is None:
+            return
+        self._batch = _BatchWriter(sock)
+        self.mqtt.sock = self._batch
+
+    def _flush_batch(self):
+        """
+        Stop batching and send all collected publishes with one write on the MQTT socket.
+
+        :return: True if the batch was sent (or there was nothing to send), False on a network error.
+        """
+        batch = self._batch
+        if batch is None:
+            return True
+        self._batch = None
+        self.mqtt.sock = batch.sock
+        if not batch.buf:
+            return True
+        try:
+            batch.sock.write(batch.buf)
+            self._last_activity_ms = self._last_tx_ms = time.ticks_ms()
+            return True
+        except OSError as e:
+            self._log("Error: Sending batched publishes failed (OSError): %s. Assuming disconnection.", e)
+            self.disconnect()
+            return False
+
+    @property
+    def sock(self):
+        """
+        The socket of the underlying MQTT connection, or None when not connected.
+        Can be registered with `uselect.poll()` so the application loop sleeps until
+        data arrives instead of polling `run()` on a fixed interval. A new socket is
+        created on every (re)connect, so re-read this after reconnecting.
+        """
+        return getattr(self.mqtt, "sock", None) if self.connected else None
+
+    @property
+    def ping_interval(self):
+        """
+        Seconds without any outgoing packet after which `run()` sends a PINGREQ (defaults to
+        `keepalive`). A ping is sent at 80% of this interval to leave headroom before the
+        broker's keepalive expires. Set to 0 to disable the SDK's pings.
+        """
+        return self._ping_interval
+
+    @ping_interval.setter
+    def ping_interval(self, seconds):
+        self._ping_interval = seconds
+
+    def _maybe_ping(self, now):
+        """
+        Send a PINGREQ if nothing has been sent for 80% of `ping_interval`. Every publish
+        resets the timer, so a device that publishes regularly never pings.
+
+        :param now: `time.ticks_ms()` value read once by the caller (`run`).
+        :raises OSError: On network errors (handled by `run`).
+        """
+        if not self._ping_interval or time.ticks_diff(now, self._last_tx_ms) <= self._ping_interval * 800:
+            return # Pings disabled, or sent something within 80% of the interval (in ms)
+        self.mqtt.ping()
+        self._last_tx_ms = now
+
+    def _sched_clock(self, now):
+        """
+        Advance the scheduler clock `_sched_ms` to the `time.ticks_ms()` value `now` and return it.
+        Once the clock reaches `_SCHED_REBASE_MS`, it and all due times are shifted back to start
+        from 0. Shifting every entry by the same amount keeps the heap ordered.
+        """
+        clock = self._sched_ms + time.ticks_diff(now, self._sched_ticks)
+        self._sched_ticks = now
+        if clock >= _SCHED_REBASE_MS:
+            for task in self._tasks:
+                task[0] -= clock
+            clock = 0
+        self._sched_ms = clock
+        return clock
+
+    def schedule(self, period_ms, func):
+        """
+        Call `func()` every `period_ms` milliseconds from `run()`, starting `period_ms` from now.
+        Tasks are kept in a heap ordered by due time, so `run()` only compares the soonest one
+        with the clock, however many tasks are scheduled. Tasks run only while connected; after
+        an outage each overdue task runs once and then keeps its period from that point.
+        Periods are limited to 2**28 ms (about 3 days) so that the scheduler's time values stay
+        small integers on 32-bit MicroPython ports, however long the device runs.
+
+        :param period_ms: Integer, the interval in milliseconds between calls (1 to 2**28).
+        :param func: Function taking no arguments.
+        :raises ValueError: If `period_ms` is not positive or exceeds the limit.
+        """
+        if not (0 < period_ms <= _SCHED_MAX_PERIOD_MS):
+            raise ValueError("Period for schedule must be between 1 and 2**28 milliseconds.")
+        self._task_seq += 1
+        due = self._sched_clock(time.ticks_ms()) + period_ms
+        heapq.heappush(self._tasks, [due, self._task_seq, period_ms, func])
+
+    def next_task_ms(self):
+        """
+        Time until the next task registered with `schedule` is due, e.g. to decide how long
+        the application loop can sleep.
+
+        :return: Milliseconds until the next task is due (0 if it is overdue), or None if no
+                 tasks are scheduled.
+        """
+        if not self._tasks:
+            return None
+        return max(0, self._tasks[0][0] - self._sched_clock(time.ticks_ms()))
+
+    def _run_tasks(self, now):
+        """
+        Call the scheduled tasks that are due and reschedule them one period later.
+
+        :param now: `time.ticks_ms()` value read once by the caller (`run`).
+        """
+        clock = self._sched_clock(now)
+        tasks = self._tasks
+        while tasks and tasks[0][0] <= clock:
+            task = heapq.heappop(tasks)
+            task[0] += task[2]
+            if task[0] <= clock: # Overdue by more than a period (e.g. while disconnected): don't catch up
+                task[0] = clock + task[2]
+            heapq.heappush(tasks, task)
+            try:
+                task[3]()
+            except Exception as e:
+                self._log("Error executing scheduled task: %s", e)
 
     def run(self):
         """
         Process incoming MQTT messages and maintain the connection.
         This method should be called regularly and frequently in your main application loop
-        to ensure timely processing of messages from the Blynk server and to allow
-        `umqtt.simple` to handle keepalive (PINGREQ/PINGRESP) with the broker.
+        to ensure timely processing of messages from the Blynk server, to send the
+        keepalive PINGREQ when the connection has been idle (see `ping_interval`), and to
+        call the tasks registered with `schedule` when they are due.
         """
         if not self.connected:
             # If not connected, there's nothing for run() to do regarding MQTT messages.
             # Reconnection logic should be handled by the main application loop if desired.
             return
-            
+
+        now = time.ticks_ms() # Read the clock once for the task, buffered-write and ping checks
+        if self._tasks:
+            self._run_tasks(now)
+            if not self.connected: # A task's publish failed
+                return
+
+        pending = self._pending_stream
+        if pending and (len(pending) >= self.batch_max or
+                time.ticks_diff(now, self._pending_since_ms) >= self.idle_flush_ms):
+            self.flush() # Buffered virtual_write values have waited long enough
+            if not self.connected:
+                return
+
+        check_msg = self.mqtt.check_msg
+        if self._batch is not None: # check_msg() reads the real socket; send any batched publishes first
+            self._flush_batch()
+            if not self.connected:
+                return
+
         try:
             # `check_msg()` is non-blocking and processes any incoming messages.
             # If a message is received, it will trigger the `_mqtt_message_callback`.
-            self.mqtt.check_msg()
+            check_msg()
             
-            # The `umqtt.simple` library handles MQTT PINGREQ/PINGRESP for keepalive
-            # automatically as part of its internal operations when `check_msg` or `wait_msg`
-            # are called, or when publishing. No explicit ping from this SDK layer is needed.
+            # `umqtt.simple` does not send keepalive pings on its own (it only handles the
+            # PINGRESP inside `check_msg`), so send one here when the link has been idle.
+            self._maybe_ping(now)
             # `_last_activity_ms` is updated on TX/RX for potential custom idle checks by user.
 
-        except OSError as e: # Network errors during check_msg usually mean connection is lost
-            self.log(f"Error in run loop (OSError during check_msg): {e}. Assuming disconnection.")
+        # umqtt.simple keeps its socket object after the link drops, so a lost connection
+        # surfaces here as an OSError from check_msg()/ping(), or earlier from a failed publish.
+        except OSError as e: # Network errors during check_msg/ping usually mean connection is lost
+            self._log("Error in run loop (OSError during check_msg/ping): %s. Assuming disconnection.", e)
             self.disconnect() # Trigger disconnect logic, including user's 'disconnect' handler
         except Exception as e: # Catch any other unexpected errors
-            self.log(f"Error in run loop (check_msg): {e}")
+            self._log("Error in run loop (check_msg): %s", e)
             # Depending on the error, a disconnect might also be warranted here,
             # but OSError is the most common indicator of a lost connection.
 
@@ -730,7 +1441,7 @@ class BlynkMQTT:
         #    if hasattr(self, "_local_pin_states") and pin_num in self._local_pin_states:
         #        self.virtual_write(pin_num, self._local_pin_states[pin_num])
         #    else:
-        #        self.log(f"sync_virtual: No local state for V{pin_num} to re-publish.")
+        #        self._log("sync_virtual: No local state for V%d to re-publish.", pin_num)
         pass
 
 
@@ -740,12 +1451,15 @@ if __name__ == '__main__':
     BLYNK_AUTH_TOKEN = "YOUR_ACTUAL_BLYNK_AUTH_TOKEN" # IMPORTANT: Replace with your token
     WIFI_SSID = "YOUR_WIFI_SSID"
     WIFI_PASS = "YOUR_WIFI_PASSWORD"
+    DEBUG = True # Set to False to silence log output (the SDK then doesn't format log messages at all)
 
     # --- Optional: Custom logger function ---
     def custom_logger(*args):
         """Simple custom logger that prepends a timestamp and 'BLYNK' tag."""
-        timestamp_s = time.ticks_ms() // 1000
-        print(f"[{timestamp_s}s BLYNK] {' '.join(map(str, args))}")
+        if not DEBUG:
+            return # Skip the timestamp and formatting work
+        # print() converts and space-separates the arguments itself; no joined string is built
+        print(f"[{time.ticks_ms() // 1000}s BLYNK]", *args)
 
     # --- Network Connection (Example for ESP32/ESP8266) ---
     # This part is specific to your MicroPython board and how it connects to WiFi.
@@ -774,7 +1488,7 @@ if __name__ == '__main__':
     # --- Initialize BlynkMQTT Client ---
     # Ensure network is connected before this step.
     blynk = BlynkMQTT(BLYNK_AUTH_TOKEN, 
-                      log_func=custom_logger, # Use our custom logger
+                      log_func=custom_logger if DEBUG else None, # Use our custom logger
                       board_type="ESP32-DevKitC-Generic", # Example device info
                       fw_version="0.2.1-sdk-example",
                       app_name="BlynkMQTTSDKDemo/1.0")
@@ -872,61 +1586,64 @@ if __name__ == '__main__':
     if blynk.connect(): # Attempt initial connection
         custom_logger("Initial connection to Blynk successful.")
         counter = 0
-        last_sensor_data_send_time_s = time.ticks_seconds()
-        last_uptime_send_time_s = time.ticks_seconds()
 
+        # Send sensor data periodically (every 15 seconds)
+        def send_sensors():
+            global counter
+            counter += 1
+            temperature = 20 + (counter % 10) # Simulated temperature
+            humidity = 50 + (counter % 20)    # Simulated humidity
+            custom_logger(f"Sending V5 (temp): {temperature}, V6 (humidity): {humidity}")
+            # Both pins in one data/stream message instead of one PUBLISH per pin
+            blynk.virtual_write_batch({5: temperature, 6: humidity})
+
+            # Example: Send a notification if temperature is high
+            if temperature > 28:
+                blynk.notify(f"High temperature alert: {temperature}°C")
+
+            # Example: Trigger an automation based on a condition
+            # if humidity < 55 and blynk.connected: # Ensure connected before triggering
+            #    blynk.trigger_automation(12345, state="on") # Replace 12345 with your automation ID
+
+        # Send device uptime periodically (every 60 seconds)
+        def send_uptime():
+            uptime_ms = time.ticks_ms()
+            uptime_s = uptime_ms // 1000
+            hours = uptime_s // 3600
+            minutes = (uptime_s % 3600) // 60
+            seconds = uptime_s % 60
+            uptime_str = f"{hours}h {minutes}m {seconds}s"
+            blynk.virtual_write(99, uptime_str) # Send uptime to V99
+            custom_logger(f"Device Uptime: {uptime_str}")
+
+            # Example: send a device log entry periodically
+            blynk.device_log("info", f"Device operational. Uptime: {uptime_str}. Counter: {counter}.")
+
+        # Called from blynk.run() when due
+        blynk.schedule(15000, send_sensors)
+        blynk.schedule(60000, send_uptime)
+
+        # Look up the methods called on every iteration once, not on each pass of the loop
+        blynk_run = blynk.run
+        next_task_ms = blynk.next_task_ms
+        sleep_ms = time.sleep_ms
         while True:
             try:
                 # Check if still connected, attempt to reconnect if not
                 if not blynk.connected:
                     custom_logger("Blynk connection lost. Attempting to reconnect...")
-                    if not blynk.connect(): # Try to reconnect
-                        custom_logger("Reconnect failed. Will retry in 10 seconds.")
-                        time.sleep(10) # Wait before retrying to avoid spamming connection attempts
+                    # Retries with 1, 2, 4, ... 60 s between attempts to avoid spamming the broker
+                    if not blynk.reconnect(): # Try to reconnect
+                        custom_logger("Reconnect failed. Will keep retrying.")
                         continue # Skip the rest of the loop if not connected
                     else:
                         custom_logger("Reconnected to Blynk successfully!")
                 
-                blynk.run()  # Process incoming MQTT messages and maintain connection
-
-                current_time_s = time.ticks_seconds() # Get current time in seconds
-
-                # Send sensor data periodically (e.g., every 15 seconds)
-                if time.ticks_diff(current_time_s, last_sensor_data_send_time_s) >= 15:
-                    counter += 1
-                    temperature = 20 + (counter % 10) # Simulated temperature
-                    humidity = 50 + (counter % 20)    # Simulated humidity
-                    custom_logger(f"Sending V5 (temp): {temperature}, V6 (humidity): {humidity}")
-                    blynk.virtual_write(5, temperature) 
-                    blynk.virtual_write(6, humidity)
-                    
-                    # Example: Send a notification if temperature is high
-                    if temperature > 28:
-                        blynk.notify(f"High temperature alert: {temperature}°C")
-                    
-                    # Example: Trigger an automation based on a condition
-                    # if humidity < 55 and blynk.connected: # Ensure connected before triggering
-                    #    blynk.trigger_automation(12345, state="on") # Replace 12345 with your automation ID
-
-                    last_sensor_data_send_time_s = current_time_s
-
-                # Send device uptime periodically (e.g., every 60 seconds)
-                if time.ticks_diff(current_time_s, last_uptime_send_time_s) >= 60:
-                    uptime_ms = time.ticks_ms()
-                    uptime_s = uptime_ms // 1000
-                    hours = uptime_s // 3600
-                    minutes = (uptime_s % 3600) // 60
-                    seconds = uptime_s % 60
-                    uptime_str = f"{hours}h {minutes}m {seconds}s"
-                    blynk.virtual_write(99, uptime_str) # Send uptime to V99
-                    custom_logger(f"Device Uptime: {uptime_str}")
-
-                    # Example: send a device log entry periodically
-                    blynk.device_log("info", f"Device operational. Uptime: {uptime_str}. Counter: {counter}.")
-                    last_uptime_send_time_s = current_time_s
-                
-                time.sleep_ms(50) # Small delay to yield processing to other tasks if any,
-                                  # and to control the loop speed. Adjust as needed.
+                blynk_run()  # Process incoming MQTT messages, maintain connection and run due tasks
+
+                # Sleep until the next task is due, but at most 50 ms so incoming messages are
+                # still handled promptly. Adjust as needed.
+                sleep_ms(max(1, min(50, next_task_ms())))
 
             except KeyboardInterrupt:
                 custom_logger("Keyboard interrupt detected. Disconnecting and exiting...")
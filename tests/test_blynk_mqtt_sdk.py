@@ -0,0 +1,692 @@
+#!/usr/bin/env python3
+import importlib.util
+import json
+import sys
+import types
+import unittest
+from pathlib import Path
+
+
+class FakeMQTTClient:
+    instances = []
+
+    def __init__(self, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.callback = None
+        self.published = []
+        self.subscribed = []
+        self.disconnected = False
+        self.pings = 0
+        self.sock = None # umqtt.simple only has a socket while connected
+        FakeMQTTClient.instances.append(self)
+
+    def set_callback(self, callback):
+        self.callback = callback
+
+    def connect(self, clean_session=True):
+        self.sock = FakeSocket()
+
+    def disconnect(self):
+        self.disconnected = True
+        self.sock = None
+
+    def subscribe(self, topic, qos=0):
+        self.subscribed.append((topic, qos))
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        self.published.append((bytes(topic), bytes(msg), qos))
+
+    def check_msg(self):
+        return None
+
+    def ping(self):
+        self.pings += 1
+
+
+class FakeSocket:
+    def __init__(self):
+        self.writes = []
+        self.rx = bytearray()
+
+    def read(self, n):
+        data = bytes(self.rx[:n])
+        del self.rx[:n]
+        return data
+
+    def write(self, data, length=None):
+        data = bytes(data if length is None else data[:length])
+        self.writes.append(data)
+        return len(data)
+
+
+class SocketMQTTClient(FakeMQTTClient):
+    """Writes PUBLISH packets to `sock` in several pieces, like umqtt.simple."""
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        super().publish(topic, msg, retain=retain, qos=qos)
+        pkt = bytearray(b"\x30\0")
+        pkt[1] = 2 + len(topic) + len(msg)
+        self.sock.write(pkt, 2)
+        self.sock.write(len(topic).to_bytes(2, "big"))
+        self.sock.write(topic)
+        self.sock.write(msg)
+
+
+class SubscribeSocketClient(SocketMQTTClient):
+    """Answers SUBSCRIBE packets written to `sock` with a SUBACK, like a broker would."""
+
+    reject = ()
+
+    def connect(self, clean_session=True):
+        super().connect(clean_session)
+        self.pid = 0
+
+    def wait_msg(self):
+        pkt = self.sock.writes[-1]
+        pos = 1
+        while pkt[pos] & 0x80: # Skip the variable-length remaining length
+            pos += 1
+        pid = pkt[pos + 1:pos + 3]
+        topics, pos = [], pos + 3
+        while pos < len(pkt):
+            size = int.from_bytes(pkt[pos:pos + 2], "big")
+            topics.append(pkt[pos + 2:pos + 2 + size])
+            pos += size + 3
+        codes = bytes(0x80 if topic in self.reject else 0 for topic in topics)
+        self.sock.rx += bytes([2 + len(codes)]) + pid + codes
+        return 0x90
+
+
+class FakeTime:
+    def __init__(self):
+        self.now_ms = 0
+        self.slept = []
+
+    def ticks_ms(self):
+        return self.now_ms
+
+    def ticks_diff(self, a, b):
+        return a - b
+
+    def ticks_add(self, a, b):
+        return a + b
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now_ms += int(seconds * 1000)
+
+    def sleep_ms(self, ms):
+        self.sleep(ms / 1000)
+
+
+def load_sdk_with_micropython_fakes(json_module=json):
+    root = Path(__file__).resolve().parents[1]
+    sdk_path = root / "lib" / "blynk_mqtt_sdk.py"
+
+    fake_machine = types.ModuleType("machine")
+    fake_machine.unique_id = lambda: b"\x01\xab"
+
+    fake_umqtt = types.ModuleType("umqtt")
+    fake_umqtt_simple = types.ModuleType("umqtt.simple")
+    fake_umqtt_simple.MQTTClient = FakeMQTTClient
+
+    originals = {
+        name: sys.modules.get(name)
+        for name in ("ujson", "orjson", "machine", "umqtt", "umqtt.simple")
+    }
+    sys.modules["ujson"] = json_module # None makes the import fail, as on CPython
+    sys.modules["orjson"] = None
+    sys.modules["machine"] = fake_machine
+    sys.modules["umqtt"] = fake_umqtt
+    sys.modules["umqtt.simple"] = fake_umqtt_simple
+
+    module_name = "blynk_mqtt_sdk_under_test"
+    sys.modules.pop(module_name, None)
+    spec = importlib.util.spec_from_file_location(module_name, sdk_path)
+    module = importlib.util.module_from_spec(spec)
+    try:
+        spec.loader.exec_module(module)
+    finally:
+        for name, original in originals.items():
+            if original is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = original
+    module.time = FakeTime()
+    return module
+
+
+class BlynkMQTTSDKTest(unittest.TestCase):
+    def setUp(self):
+        FakeMQTTClient.instances.clear()
+        self.sdk = load_sdk_with_micropython_fakes()
+
+    def connected_client(self, **kwargs):
+        client = self.sdk.BlynkMQTT("token", log_func=lambda *args: None, **kwargs)
+        self.assertTrue(client.connect())
+        mqtt = FakeMQTTClient.instances[-1]
+        mqtt.published.clear()
+        return client, mqtt
+
+    def published_json(self, mqtt, topic):
+        return [json.loads(msg) for t, msg, qos in mqtt.published if t == topic.encode()]
+
+    def test_connect_subscribes_with_pre_encoded_topics(self):
+        client, mqtt = self.connected_client()
+
+        self.assertEqual(mqtt.subscribed[0], (self.sdk.TOPIC_CONTROL_B, 0))
+        self.assertTrue(all(isinstance(topic, bytes) for topic, qos in mqtt.subscribed))
+        self.assertEqual(self.sdk.TOPIC_DATA_STREAM_B, self.sdk.TOPIC_DATA_STREAM.encode())
+
+    def test_virtual_write_batch_sends_all_pins_in_one_publish(self):
+        client, mqtt = self.connected_client()
+
+        self.assertTrue(client.virtual_write_batch({5: 12, 99: 3600}))
+
+        self.assertEqual(len(mqtt.published), 1)
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM), [{"v5": 12, "v99": 3600}])
+
+    def test_virtual_write_batch_validates_pins(self):
+        client, mqtt = self.connected_client()
+
+        self.assertFalse(client.virtual_write_batch({}))
+        with self.assertRaises(ValueError):
+            client.virtual_write_batch({256: 1})
+        with self.assertRaises(TypeError):
+            client.virtual_write_batch({"v5": 1})
+        self.assertEqual(mqtt.published, [])
+
+    def test_virtual_write_passes_qos_through(self):
+        client, mqtt = self.connected_client()
+
+        self.assertTrue(client.virtual_write(5, 1))
+        self.assertTrue(client.virtual_write(6, 2, qos=1))
+
+        self.assertEqual([qos for topic, msg, qos in mqtt.published], [0, 1])
+
+    def test_publish_metadata_raw_sends_bytes_unchanged(self):
+        client, mqtt = self.connected_client()
+        encoded = b'{"board_id":"01ab"}'
+
+        self.assertTrue(client.publish_metadata_raw(encoded))
+
+        self.assertEqual(mqtt.published, [(self.sdk.TOPIC_METADATA_UPDATE.encode(), encoded, 0)])
+        with self.assertRaises(TypeError):
+            client.publish_metadata_raw({"board_id": "01ab"})
+
+    def test_batched_publishes_leave_in_one_socket_write(self):
+        self.sdk.MQTTClient = SocketMQTTClient
+        client, mqtt = self.connected_client()
+        sock = mqtt.sock
+
+        client._begin_batch()
+        self.assertTrue(client.virtual_write(99, 60))
+        self.assertTrue(client.device_log("info", "uptime"))
+        self.assertEqual(sock.writes, [])
+        self.assertTrue(client._flush_batch())
+
+        self.assertIs(mqtt.sock, sock)
+        self.assertEqual(len(sock.writes), 1)
+        self.assertTrue(sock.writes[0].startswith(b"\x30"))
+        self.assertIn(self.sdk.TOPIC_DATA_STREAM.encode(), sock.writes[0])
+        self.assertIn(self.sdk.TOPIC_DEVICE_LOG.encode(), sock.writes[0])
+
+    def test_control_message_dispatches_by_pin_number(self):
+        client, mqtt = self.connected_client()
+        received = []
+        handler = client.on("V1", received.append)
+
+        mqtt.callback(self.sdk.TOPIC_CONTROL.encode(), b'{"pin": "v1", "value": "1"}')
+        mqtt.callback(self.sdk.TOPIC_CONTROL.encode(), b'{"pin": "V1", "value": "0"}')
+        mqtt.callback(self.sdk.TOPIC_CONTROL.encode(), b'{"pin": "v2", "value": "x"}')
+
+        self.assertIs(client.handlers_by_pin[1], handler)
+        self.assertEqual(received, ["1", "0"])
+
+    def test_handler_assigned_into_pin_table_fires_without_logger(self):
+        client = self.sdk.BlynkMQTT("token")
+        self.assertTrue(client.connect())
+        mqtt = FakeMQTTClient.instances[-1]
+        received = []
+        client.handlers_by_pin[1] = received.append
+
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "v1", "value": "1"}')
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "v1", "value": "2"}')
+
+        self.assertEqual(received, ["1", "2"])
+
+    def test_messages_are_routed_by_topic(self):
+        client, mqtt = self.connected_client()
+        calls = []
+        client.on("info_get", lambda: calls.append("info_get"))
+        client.on("ota_request", lambda data: calls.append(data))
+
+        mqtt.callback(self.sdk.TOPIC_INFO_GET.encode(), b"")
+        mqtt.callback(self.sdk.TOPIC_OTA_REQUEST.encode(), b'{"command": "start"}')
+        mqtt.callback(b"blynk/v1/device/unknown", b"{}")
+
+        self.assertEqual(calls, ["info_get", {"command": "start"}])
+        self.assertEqual(mqtt.published, [])
+
+    def test_default_logger_is_module_noop(self):
+        client = self.sdk.BlynkMQTT("token")
+        self.assertIs(client.log, self.sdk._noop)
+        self.assertTrue(client.connect())
+        mqtt = FakeMQTTClient.instances[-1]
+        received = []
+        client.on("V3", received.append)
+
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "v3", "value": [1, 2]}')
+
+        self.assertEqual(received, [[1, 2]])
+
+    def test_connect_subscribes_to_all_topics_in_one_packet(self):
+        self.sdk.MQTTClient = SubscribeSocketClient
+        client, mqtt = self.connected_client()
+
+        self.assertEqual(len(mqtt.sock.writes), 1)
+        pkt = mqtt.sock.writes[0]
+        self.assertEqual(pkt[0], 0x82)
+        self.assertEqual((pkt[1] & 0x7F) + (pkt[2] << 7), len(pkt) - 3) # More than 127 bytes
+        for topic in self.sdk._SUBSCRIBE_TOPICS:
+            self.assertIn(len(topic).to_bytes(2, "big") + topic + b"\x00", pkt)
+        self.assertEqual(mqtt.subscribed, [])
+
+    def test_rejected_topic_is_resubscribed_individually(self):
+        self.sdk.MQTTClient = SubscribeSocketClient
+        SubscribeSocketClient.reject = (self.sdk.TOPIC_OTA_REQUEST_B,)
+        try:
+            client, mqtt = self.connected_client()
+        finally:
+            SubscribeSocketClient.reject = ()
+
+        self.assertEqual(mqtt.subscribed, [(self.sdk.TOPIC_OTA_REQUEST_B, 0)])
+
+    def test_buffered_virtual_writes_are_coalesced_until_idle(self):
+        client, mqtt = self.connected_client(buffered=True, idle_flush_ms=100)
+
+        self.assertTrue(client.virtual_write(0, 1))
+        self.assertTrue(client.virtual_write(1, 2))
+        self.assertTrue(client.virtual_write(0, 3))
+        client.run()
+        self.assertEqual(mqtt.published, [])
+
+        self.sdk.time.now_ms += 100
+        client.run()
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM), [{"v0": 3, "v1": 2}])
+
+    def test_buffered_virtual_writes_flush_at_batch_max(self):
+        client, mqtt = self.connected_client(buffered=True, batch_max=2)
+
+        client.virtual_write(0, 1)
+        client.virtual_write(1, 2)
+        client.virtual_write(2, 3, qos=1) # QoS 1 is never buffered
+        client.virtual_write(3, 4)
+        self.assertTrue(client.flush())
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM),
+                         [{"v0": 1, "v1": 2}, {"v2": 3}, {"v3": 4}])
+
+    def test_immediate_write_replaces_buffered_value_for_same_pin(self):
+        client, mqtt = self.connected_client(buffered=True)
+
+        client.virtual_write(5, "old")
+        client.virtual_write(5, "new", qos=1)
+        client.virtual_write(6, "old")
+        client.virtual_write_batch({6: "new"})
+        self.sdk.time.now_ms += 1000
+        client.run()
+        self.assertTrue(client.flush())
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM),
+                         [{"v5": "new"}, {"v6": "new"}])
+
+    def test_run_pings_only_after_idle_keepalive(self):
+        client, mqtt = self.connected_client()
+        self.assertEqual(client.ping_interval, 160)
+        self.assertEqual(mqtt.kwargs["keepalive"], 160)
+
+        self.sdk.time.now_ms += 100000
+        client.virtual_write(0, 1)
+        self.sdk.time.now_ms += 100000
+        client.run()
+        self.assertEqual(mqtt.pings, 0) # The publish reset the idle timer
+
+        self.sdk.time.now_ms += 30000
+        client.run()
+        client.run()
+        self.assertEqual(mqtt.pings, 1)
+
+    def test_device_info_payload_is_cached_until_fields_change(self):
+        client, mqtt = self.connected_client(board_type="ESP32", fw_version="1.0")
+
+        self.assertTrue(client.publish_device_info())
+        cached = client._device_info_cache
+        self.assertEqual(cached[0], ("ESP32", "1.0", None))
+        mqtt.callback(self.sdk.TOPIC_INFO_GET_B, b"")
+        self.assertIs(client._device_info_cache, cached)
+        self.assertTrue(client.publish_device_info(fw_version="1.1"))
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_INFO_UPDATE), [
+            {"board": "ESP32", "firmwareVersion": "1.0"},
+            {"board": "ESP32", "firmwareVersion": "1.0"},
+            {"board": "ESP32", "firmwareVersion": "1.1"},
+        ])
+
+    def test_random_client_id_when_unique_id_is_unavailable(self):
+        self.sdk.machine = types.SimpleNamespace() # No unique_id()
+        fake_urandom = types.ModuleType("urandom")
+        fake_urandom.getrandbits = lambda bits: 0xBEEF
+        original = sys.modules.get("urandom")
+        sys.modules["urandom"] = fake_urandom
+        try:
+            client = self.sdk.BlynkMQTT("token")
+        finally:
+            if original is None:
+                sys.modules.pop("urandom", None)
+            else:
+                sys.modules["urandom"] = original
+
+        self.assertEqual(client.client_id, "blynk_mp_0000beef")
+
+    def test_client_id_from_unique_id(self):
+        client = self.sdk.BlynkMQTT("token")
+
+        self.assertEqual(client.client_id, "blynk_mp_01ab")
+
+    def test_control_message_ignores_invalid_virtual_pins(self):
+        client, mqtt = self.connected_client()
+        received = []
+        client.on("V255", received.append)
+
+        for pin in ("v256", "v", "vx1", "d255", ""):
+            mqtt.callback(self.sdk.TOPIC_CONTROL_B, json.dumps({"pin": pin, "value": pin}).encode())
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "V255", "value": 7}')
+
+        self.assertEqual(received, [7])
+
+    def test_virtual_catch_all_handler_receives_pin_and_value(self):
+        client, mqtt = self.connected_client()
+        per_pin, routed = [], []
+        client.on("V1", per_pin.append)
+        client.on("virtual", lambda pin, value: routed.append((pin, value)))
+
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "v1", "value": "1"}')
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "V42", "value": [1, 2]}')
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "v300", "value": 0}')
+
+        self.assertEqual(routed, [(1, "1"), (42, [1, 2])])
+        self.assertEqual(per_pin, [])
+
+    def test_virtual_write_fast_publishes_single_value(self):
+        client, mqtt = self.connected_client(buffered=True)
+
+        self.assertTrue(client.virtual_write_fast(7, 21.5))
+        for pin in (-1, 256):
+            with self.assertRaises(ValueError):
+                client.virtual_write_fast(pin, 1)
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM), [{"v7": 21.5}])
+
+    def test_virtual_write_fast_discards_buffered_value_for_its_pin(self):
+        client, mqtt = self.connected_client(buffered=True)
+
+        client.virtual_write(7, "old")
+        client.virtual_write(8, "kept")
+        client.virtual_write_fast(7, "new")
+        self.assertTrue(client.flush())
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM),
+                         [{"v7": "new"}, {"v8": "kept"}])
+
+    def test_single_value_payloads_are_valid_json(self):
+        client, mqtt = self.connected_client()
+
+        for pin in (0, 9, 10, 99, 100, 255):
+            self.assertTrue(client.virtual_write(pin, pin * 2))
+        client.virtual_write(1, 'say "hi"')
+        client.virtual_write(2, 1, 2.5, None)
+        client.virtual_write(3)
+        self.assertTrue(client.notify('Alert: "hot"'))
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DATA_STREAM), [
+            {"v0": 0}, {"v9": 18}, {"v10": 20}, {"v99": 198}, {"v100": 200}, {"v255": 510},
+            {"v1": 'say "hi"'}, {"v2": [1, 2.5, None]}, {"v3": None},
+        ])
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_NOTIFICATIONS), [{"body": 'Alert: "hot"'}])
+
+    def test_payload_is_not_parsed_without_a_consumer(self):
+        parsed = []
+        self.sdk.json = types.SimpleNamespace(dumps=json.dumps,
+                                              loads=lambda b: parsed.append(b) or json.loads(b))
+        client = self.sdk.BlynkMQTT("token")
+        self.assertTrue(client.connect())
+        mqtt = FakeMQTTClient.instances[-1]
+
+        mqtt.callback(self.sdk.TOPIC_CONTROL_B, b'{"pin": "v1", "value": "1"}')
+        mqtt.callback(self.sdk.TOPIC_PROPERTY_GET_B, b'{"pin": "v0", "property": "label"}')
+        mqtt.callback(self.sdk.TOPIC_OTA_REQUEST_B, b'{"command": "start"}')
+        self.assertEqual(parsed, [])
+
+        client.on("ota_request", lambda data: None)
+        mqtt.callback(self.sdk.TOPIC_OTA_REQUEST_B, b'{"command": "start"}')
+        self.assertEqual(parsed, [b'{"command": "start"}'])
+
+    def test_reconnect_backs_off_geometrically(self):
+        client = self.sdk.BlynkMQTT("token")
+        attempts = []
+        # BlynkMQTT uses __slots__, so connect is replaced on the (freshly loaded) class
+        self.sdk.BlynkMQTT.connect = lambda self: attempts.append(1) and False
+
+        self.assertFalse(client.reconnect(max_retries=8, base=1, cap=60))
+
+        self.assertEqual(len(attempts), 8)
+        self.assertEqual(self.sdk.time.slept, [1, 2, 4, 8, 16, 32, 60])
+
+    def test_reconnect_stops_once_connected(self):
+        client = self.sdk.BlynkMQTT("token")
+        results = [False, False, True]
+        self.sdk.BlynkMQTT.connect = lambda self: results.pop(0)
+
+        self.assertTrue(client.reconnect(max_retries=None, base=0.5))
+
+        self.assertEqual(self.sdk.time.slept, [0.5, 1.0])
+
+    def test_on_normalizes_names_in_one_pass(self):
+        client, mqtt = self.connected_client()
+        handler = lambda *args: None
+
+        client.on("v07", handler)
+        client.on("Connect", handler)
+        client.on("Virtual", handler)
+        with self.assertRaises(ValueError):
+            client.on("V256", handler)
+
+        self.assertIs(client.handlers_by_pin[7], handler)
+        self.assertIs(client._any_virtual_handler, handler)
+        self.assertEqual(sorted(client._handlers), ["V7", "connect", "virtual"])
+
+    def test_bridge_accepts_only_virtual_pin_designators(self):
+        client, mqtt = self.connected_client()
+
+        self.assertTrue(client.bridge_virtual_write("other", "V3", 1))
+        self.assertTrue(client.bridge_virtual_write("other", "v4", 2))
+        for pin in ("", "d5", 3):
+            with self.assertRaises(TypeError):
+                client.bridge_virtual_write("other", pin, 0)
+
+        self.assertEqual([p["pin"] for p in self.published_json(mqtt, self.sdk.TOPIC_BRIDGE_REQUEST)], ["V3", "v4"])
+
+    def test_device_log_payload(self):
+        client, mqtt = self.connected_client()
+
+        self.assertTrue(client.device_log("warn", 'said "hi"'))
+        self.assertTrue(client.device_log("info", 42))
+        for level in ("fatal", ["info"], None):
+            with self.assertRaises(ValueError):
+                client.device_log(level, "x")
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_DEVICE_LOG), [
+            {"level": "warn", "message": 'said "hi"'},
+            {"level": "info", "message": "42"},
+        ])
+
+    def test_optional_fields_are_omitted_when_none(self):
+        client, mqtt = self.connected_client()
+
+        client.publish_ota_status("failed", version=2, error_code="7")
+        client.publish_ota_status(None)
+        client.trigger_automation(5, state=1)
+        client.trigger_automation(6, value=0)
+
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_OTA_UPDATE),
+                         [{"status": "failed", "version": "2", "errorCode": 7}, {"status": "None"}])
+        self.assertEqual(self.published_json(mqtt, self.sdk.TOPIC_AUTOMATION_TRIGGER),
+                         [{"automationId": 5, "state": "1"}, {"automationId": 6, "value": 0}])
+
+    def test_log_formats_only_with_a_logger(self):
+        lines = []
+        client = self.sdk.BlynkMQTT("token", log_func=lines.append)
+        client._log("ota %s %d", {"status": "ok"}, 3)
+        self.assertEqual(lines[-1], "ota {'status': 'ok'} 3")
+        client._log("topic %s", b"ds/info")
+        self.assertEqual(lines[-1], "topic ds/info")
+
+        class Unformattable:
+            def __str__(self):
+                raise AssertionError("formatted without a logger")
+
+        self.sdk.BlynkMQTT("token")._log("value %s", Unformattable())
+
+    def test_scheduler_clock_is_rebased(self):
+        client, mqtt = self.connected_client()
+        calls = []
+        client.schedule(60000, lambda: calls.append(1))
+        with self.assertRaises(ValueError):
+            client.schedule((1 << 28) + 1, lambda: None)
+
+        for _ in range(5000): # About 3.5 days of 60 s periods
+            self.sdk.time.now_ms += 60000
+            client.run()
+
+        self.assertEqual(len(calls), 5000)
+        self.assertLess(client._sched_ms, 1 << 28)
+        self.assertEqual(client.next_task_ms(), 60000)
+
+    def test_run_reads_the_clock_once(self):
+        client, mqtt = self.connected_client()
+        client.schedule(60000, lambda: None)
+        fake_time = self.sdk.time
+        reads = []
+        fake_time.ticks_ms = lambda: reads.append(1) or fake_time.now_ms
+
+        client.run()
+
+        self.assertEqual(len(reads), 1)
+
+    def test_publishers_default_to_qos_0(self):
+        client, mqtt = self.connected_client()
+
+        client.device_log("info", "up")
+        client.publish_location(1, 2)
+        client.notify("alert", qos=1)
+        client.log_event("boot", qos=1)
+        client.set_property("V1", "label", "x")
+        client.set_property("V1", "color", "red", qos=1)
+        client.trigger_automation(5)
+        client.trigger_automation(5, qos=1)
+
+        self.assertEqual([qos for t, msg, qos in mqtt.published], [0, 0, 1, 1, 0, 1, 0, 1])
+
+    def test_publishing_while_disconnected_skips_the_client(self):
+        client = self.sdk.BlynkMQTT("token", board_type="ESP32")
+        mqtt = FakeMQTTClient.instances[-1]
+        mqtt.publish = lambda *args, **kwargs: self.fail("publish called while disconnected")
+
+        self.assertFalse(client.virtual_write(1, 2))
+        self.assertFalse(client.notify("x"))
+        self.assertFalse(client.device_log("info", "x"))
+        self.assertFalse(client.publish_location(1, 2))
+        self.assertFalse(client.publish_device_info())
+        self.assertFalse(client.publish_metadata_raw(b"{}"))
+
+    def test_run_polls_clients_without_a_socket_attribute(self):
+        client, mqtt = self.connected_client()
+        del mqtt.sock
+        polled = []
+        mqtt.check_msg = lambda: polled.append(1)
+
+        client.run()
+
+        self.assertTrue(client.connected)
+        self.assertEqual(polled, [1])
+
+    def test_published_payloads_are_not_reused(self):
+        client, mqtt = self.connected_client()
+        kept = []
+        mqtt.publish = lambda topic, msg, retain=False, qos=0: kept.append(msg) # Keeps a reference, no copy
+
+        client.notify("a")
+        client.notify("b")
+        client.virtual_write(1, 2)
+
+        self.assertEqual(kept, [b'{"body":"a"}', b'{"body":"b"}', b'{"v1":2}'])
+        self.assertTrue(all(type(msg) is bytes for msg in kept))
+
+    def test_client_has_no_instance_dict(self):
+        client, mqtt = self.connected_client(buffered=True)
+        client.schedule(1000, lambda: None)
+
+        self.assertFalse(hasattr(client, "__dict__"))
+        with self.assertRaises(AttributeError):
+            client.unknown_attribute = 1
+
+    def test_stdlib_json_fallback_is_compact(self):
+        self.sdk = load_sdk_with_micropython_fakes(json_module=None)
+        client, mqtt = self.connected_client()
+
+        client.publish_location(1.5, 2, alt=3)
+        client.virtual_write(4, [1, 2])
+
+        self.assertEqual(mqtt.published[0][1], b'{"lat":1.5,"lon":2,"alt":3}')
+        self.assertEqual(mqtt.published[1][1], b'{"v4":[1,2]}')
+
+    def test_ujson_uses_compact_separators_when_supported(self):
+        client, mqtt = self.connected_client()
+
+        client.publish_location(1.5, 2, alt=3)
+
+        self.assertEqual(mqtt.published[0][1], b'{"lat":1.5,"lon":2,"alt":3}')
+
+    def test_ujson_without_separators_argument_still_publishes(self):
+        old_ujson = types.SimpleNamespace(dumps=lambda obj: json.dumps(obj), loads=json.loads)
+        self.sdk = load_sdk_with_micropython_fakes(json_module=old_ujson)
+        client, mqtt = self.connected_client()
+
+        client.publish_location(1.5, 2)
+
+        self.assertEqual(mqtt.published[0][1], b'{"lat": 1.5, "lon": 2}')
+
+    def test_schedule_runs_due_tasks_from_run(self):
+        client, mqtt = self.connected_client()
+        calls = []
+        client.schedule(15000, lambda: calls.append("sensors"))
+        client.schedule(60000, lambda: calls.append("uptime"))
+
+        for _ in range(4):
+            self.sdk.time.now_ms += 15000
+            client.run()
+        self.assertEqual(calls, ["sensors"] * 4 + ["uptime"])
+        self.assertEqual(client.next_task_ms(), 15000)
+
+        calls.clear()
+        self.sdk.time.now_ms += 100000 # Overdue tasks run once, without catching up
+        client.run()
+        client.run()
+        self.assertEqual(calls, ["sensors", "uptime"])
+        self.assertEqual(client.next_task_ms(), 15000)
+
+if __name__ == "__main__":
+    unittest.main()